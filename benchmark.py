@@ -0,0 +1,379 @@
+# benchmark.py
+"""Benchmarks reproducibles de los caminos críticos de Zegion.
+
+Genera un árbol de addons sintético, mide descubrimiento, ingesta, persistencia,
+búsqueda, preprocess_data y predict_optimization, e imprime un informe JSON con
+rendimiento, percentiles de latencia y memoria máxima.
+
+    python benchmark.py --modules 200 --files 8 --output actual.json
+    python benchmark.py --baseline base.json           # compara; código 1 si hay regresiones
+    python benchmark.py --save-baseline base.json      # guarda esta ejecución como referencia
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import importlib.util
+import tracemalloc
+import numpy as np
+from database_manager import DatabaseManager
+from features import ENVIRONMENT_FEATURES, FEATURE_SCHEMA, FeatureNormalizer, build_feature_matrix
+from mahoraga import Mahoraga, ACTIVATIONS
+from odoo_analysis import OdooAnalysisThread, analyze_module
+from odoo_discovery import ModuleDiscovery, iter_module_files
+from module_manifest import iter_source_records
+
+FIELD_TYPES = ['Char', 'Integer', 'Float', 'Boolean', 'Many2one', 'One2many', 'Date', 'Text']
+WORDS = ['partner', 'amount', 'order', 'line', 'invoice', 'stock', 'product', 'price', 'state', 'company']
+
+
+def generate_addons(root, modules=50, files_per_module=5, file_lines=200, tests_per_module=1, seed=0):
+    """Crea un árbol de addons con modelos, campos, métodos y suites de unittest deterministas."""
+    rng = random.Random(seed)
+    total_bytes = 0
+    for index in range(modules):
+        module_name = f"bench_module_{index:04d}"
+        module_path = os.path.join(root, module_name)
+        os.makedirs(os.path.join(module_path, 'models'))
+        # Cada módulo depende de hasta dos anteriores: un grafo acíclico con cadenas largas
+        depends = sorted({f"bench_module_{rng.randrange(index):04d}" for _ in range(min(index, 2))})
+        files = {
+            '__manifest__.py': repr({"name": module_name, "version": "16.0.1.0.0", "depends": ['base'] + depends}),
+            '__init__.py': "from . import models\n",
+            'models/__init__.py': "".join(f"from . import model_{number}\n" for number in range(files_per_module)),
+        }
+        for number in range(files_per_module):
+            files[f'models/model_{number}.py'] = synthetic_model(rng, module_name, number, file_lines)
+        if tests_per_module:
+            os.makedirs(os.path.join(module_path, 'tests'))
+            files['tests/__init__.py'] = ""
+            for number in range(tests_per_module):
+                files[f'tests/test_{number}.py'] = (
+                    "import unittest\n\n\nclass TestSynthetic(unittest.TestCase):\n"
+                    + "".join(f"    def test_{case}(self):\n        self.assertEqual({case} + 1, {case + 1})\n\n"
+                              for case in range(5)))
+        for rel_path, content in files.items():
+            with open(os.path.join(module_path, rel_path), 'w', encoding='utf-8') as f:
+                f.write(content)
+            total_bytes += len(content.encode('utf-8'))
+    return total_bytes
+
+
+def synthetic_model(rng, module_name, number, file_lines):
+    model_name = f"{module_name}.model_{number}"
+    lines = ["from odoo import api, fields, models", "", "",
+             f"class Model{number}(models.Model):", f"    _name = '{model_name}'",
+             f"    _inherit = ['mail.thread', '{rng.choice(WORDS)}.{rng.choice(WORDS)}']", ""]
+    while len(lines) < file_lines:
+        name = f"{rng.choice(WORDS)}_{rng.choice(WORDS)}_{len(lines)}"
+        if rng.random() < 0.6:
+            lines.append(f"    {name} = fields.{rng.choice(FIELD_TYPES)}(string='{name.title()}')")
+        else:
+            lines.extend([f"    def _compute_{name}(self):", "        for record in self:",
+                          f"            record.{rng.choice(WORDS)}_total = sum(record.mapped('{rng.choice(WORDS)}'))", ""])
+    return "\n".join(lines) + "\n"
+
+
+def summarize(latencies, items=None, item_name='ops', bytes_processed=None):
+    """Rendimiento y percentiles (ms) de una lista de latencias en segundos."""
+    latencies = np.asarray(latencies, dtype=np.float64)
+    total = float(latencies.sum())
+    items = len(latencies) if items is None else items
+    result = {
+        "samples": len(latencies),
+        "total_s": round(total, 6),
+        f"{item_name}_per_s": round(items / total, 3) if total else None,
+        "p50_ms": round(float(np.percentile(latencies, 50)) * 1000, 4),
+        "p90_ms": round(float(np.percentile(latencies, 90)) * 1000, 4),
+        "p99_ms": round(float(np.percentile(latencies, 99)) * 1000, 4),
+        "max_ms": round(float(latencies.max()) * 1000, 4),
+    }
+    if bytes_processed is not None and total:
+        result["mb_per_s"] = round(bytes_processed / total / (1024 ** 2), 3)
+    return result
+
+
+def peak_memory(function):
+    """Memoria Python máxima (MB) de una ejecución aparte, para no falsear los tiempos."""
+    tracemalloc.start()
+    try:
+        function()
+        return round(tracemalloc.get_traced_memory()[1] / (1024 ** 2), 3)
+    finally:
+        tracemalloc.stop()
+
+
+def timed(function, repeat, warmup=0):
+    # Las primeras llamadas pagan importaciones, cachés frías y la compilación de consultas
+    for _ in range(warmup):
+        function()
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+class Benchmarks:
+    def __init__(self, workdir, args):
+        self.workdir = workdir
+        self.args = args
+        self.addons = os.path.join(workdir, 'addons')
+        os.makedirs(self.addons)
+        self.source_bytes = generate_addons(self.addons, args.modules, args.files, args.lines, args.tests, args.seed)
+        self.databases = 0
+
+    def new_database(self):
+        self.databases += 1
+        db_manager = DatabaseManager(os.path.join(self.workdir, f'bench_{self.databases}.db'))
+        path_id = db_manager.save_odoo_path(self.addons)
+        return db_manager, path_id
+
+    def discovery(self):
+        def discover():
+            for entry in ModuleDiscovery(self.addons).iter_modules():
+                for _ in iter_module_files(entry.path):
+                    pass
+        return dict(summarize(timed(discover, self.args.repeat, self.args.warmup), items=self.args.modules * self.args.repeat,
+                              item_name='modules'),
+                    peak_memory_mb=peak_memory(discover))
+
+    def ingestion(self):
+        # Un módulo por llamada, en serie: latencia por módulo de analyze_module (incluye sus tests)
+        def ingest():
+            db_manager, path_id = self.new_database()
+            latencies = []
+            for entry in ModuleDiscovery(self.addons).iter_modules():
+                started = time.perf_counter()
+                analyze_module(entry.path, path_id, None, False, None, True, db_manager)
+                latencies.append(time.perf_counter() - started)
+            db_manager.conn.close()
+            return latencies
+        for _ in range(self.args.warmup):
+            ingest()
+        return dict(summarize(ingest(), item_name='modules', bytes_processed=self.source_bytes),
+                    peak_memory_mb=peak_memory(ingest))
+
+    def scan(self):
+        # Análisis completo y reanálisis sin cambios con el pool de procesos
+        db_manager, path_id = self.new_database()
+
+        def run_scan(incremental):
+            previous = db_manager.get_module_manifests(path_id) if incremental else None
+            thread = OdooAnalysisThread(self.addons, path_id, db_manager.db_name, previous, incremental,
+                                        self.args.workers)
+            started = time.perf_counter()
+            thread.run()
+            return time.perf_counter() - started
+
+        full = run_scan(False)
+        incremental = timed(lambda: run_scan(True), self.args.repeat, self.args.warmup)
+        db_manager.conn.close()
+        return {
+            "full": summarize([full], items=self.args.modules, item_name='modules', bytes_processed=self.source_bytes),
+            "incremental": summarize(incremental, items=self.args.modules * self.args.repeat, item_name='modules'),
+            "workers": self.args.workers,
+        }
+
+    def persistence(self):
+        db_manager, _ = self.new_database()
+        rng = np.random.default_rng(self.args.seed)
+        rows = self.args.rows
+        metrics = [(float(timestamp), {column: float(value) for column, value in zip(ENVIRONMENT_FEATURES, values)})
+                   for timestamp, values in enumerate(rng.random((rows, len(ENVIRONMENT_FEATURES))) * 100)]
+        batch_size = 500
+
+        def save_metrics():
+            for start in range(0, rows, batch_size):
+                db_manager.save_environment_metrics_batch(metrics[start:start + batch_size])
+
+        def read_metrics():
+            db_manager.get_environment_metrics(ENVIRONMENT_FEATURES)
+
+        blobs = [{f"{self.args.seed}-{index}-{number}": rng.bytes(4096) for number in range(50)} for index in range(20)]
+        blob_batches = iter(blobs)
+        result = {
+            "metrics_write": summarize(timed(save_metrics, self.args.repeat, self.args.warmup), items=rows * self.args.repeat,
+                                       item_name='rows'),
+            "metrics_read": summarize(timed(read_metrics, self.args.repeat, self.args.warmup), items=rows * self.args.repeat,
+                                      item_name='rows'),
+            "blobs_write": summarize(timed(lambda: db_manager.save_source_blobs(next(blob_batches)), len(blobs)),
+                                     items=50 * len(blobs), item_name='blobs', bytes_processed=4096 * 50 * len(blobs)),
+            "peak_memory_mb": peak_memory(save_metrics),
+        }
+        db_manager.conn.close()
+        return result
+
+    def search(self):
+        db_manager, path_id = self.new_database()
+        # Solo blobs y manifest, que es lo que consulta la búsqueda: sin parseo ni unittest
+        with db_manager.batch():
+            for entry in ModuleDiscovery(self.addons).iter_modules():
+                manifest = {}
+                for module_name, rel_path, mtime, size, file_hash, data in iter_source_records(entry.path):
+                    manifest[rel_path] = (mtime, size, file_hash)
+                    db_manager.save_source_blobs({file_hash: data})
+                db_manager.save_module_manifest(entry.name, path_id, manifest)
+        queries = ['partner_amount', 'fields Many2one', 'mapped', 'bench_module_0001', 'inexistente_xyz']
+        for query in queries * self.args.warmup:
+            db_manager.search_sources(query)
+        latencies = []
+        for _ in range(self.args.repeat):
+            for query in queries:
+                started = time.perf_counter()
+                db_manager.search_sources(query)
+                latencies.append(time.perf_counter() - started)
+        db_manager.conn.close()
+        return summarize(latencies, item_name='queries')
+
+    def inference(self):
+        db_manager, _ = self.new_database()
+        mahoraga = Mahoraga(db_manager)
+        rng = np.random.default_rng(self.args.seed)
+        module_stats = {"module_count": self.args.modules, "tested_module_count": self.args.modules,
+                        "module_file_count": self.args.modules * self.args.files}
+        environments = [{name: float(value) for name, value in zip(ENVIRONMENT_FEATURES, values)}
+                        for values in rng.random((self.args.predictions, len(ENVIRONMENT_FEATURES))) * 100]
+        normalizer = FeatureNormalizer().fit(
+            build_feature_matrix([list(metrics.values()) for metrics in environments], module_stats))
+        if importlib.util.find_spec('tensorflow') is not None:
+            mahoraga.export_dense_layers(mahoraga.model, normalizer)
+            backend = 'tensorflow'
+        else:
+            # Sin TensorFlow se usan pesos aleatorios con la misma arquitectura: mide el paso NumPy
+            sizes = [len(FEATURE_SCHEMA), 64, 32, 1]
+            mahoraga.publish(normalizer, [
+                (rng.standard_normal((inputs, outputs)).astype(np.float32), np.zeros(outputs, dtype=np.float32),
+                 ACTIVATIONS['relu' if outputs > 1 else 'linear'])
+                for inputs, outputs in zip(sizes, sizes[1:])])
+            backend = 'numpy-random-weights'
+
+        def predict_cold():
+            for metrics in environments:
+                mahoraga.predict_optimization(metrics, module_stats)
+
+        def predict_single(metrics):
+            started = time.perf_counter()
+            mahoraga.predict_optimization(metrics, module_stats)
+            return time.perf_counter() - started
+
+        for metrics in environments[:self.args.warmup * 10]:
+            mahoraga.predict_optimization(metrics, module_stats)
+        cold = [predict_single(metrics) for metrics in environments]
+        # Misma entrada repetida: la predicción memorizada
+        warm = [predict_single(environments[0]) for _ in range(self.args.predictions)]
+        preprocess = timed(lambda: mahoraga.preprocess_data(environments, module_stats), self.args.repeat,
+                           self.args.warmup)
+        db_manager.conn.close()
+        return {
+            "backend": backend,
+            "predict_cold": summarize(cold, item_name='predictions'),
+            "predict_warm": summarize(warm, item_name='predictions'),
+            "preprocess_data": summarize(preprocess, items=len(environments) * self.args.repeat, item_name='rows'),
+            "peak_memory_mb": peak_memory(predict_cold),
+        }
+
+
+BENCHMARKS = ['discovery', 'ingestion', 'scan', 'persistence', 'search', 'inference']
+# Métricas comparadas con la referencia: (ruta en el informe, True si mayor es mejor)
+COMPARED_SUFFIXES = {'_per_s': True, 'p50_ms': False, 'p90_ms': False, 'peak_memory_mb': False}
+CONFIG_KEYS = ('modules', 'files', 'lines', 'tests', 'rows', 'predictions', 'repeat', 'warmup', 'workers', 'seed')
+# Por debajo de estas diferencias absolutas un cambio relativo es ruido de medida, no una regresión
+ABSOLUTE_FLOORS = {'p50_ms': 0.1, 'p90_ms': 0.1, 'peak_memory_mb': 1.0}
+
+
+def flatten(report, prefix=''):
+    for key, value in report.items():
+        path = f"{prefix}.{key}" if prefix else key
+        if isinstance(value, dict):
+            yield from flatten(value, path)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield path, value
+
+
+def compare(results, baseline, tolerance, min_total=0.05):
+    """Cambio relativo de cada métrica comparable; negativo es peor. Devuelve (comparación, regresiones).
+
+    Solo es regresión si empeora más que tolerance, supera el mínimo absoluto de su métrica
+    y el grupo midió al menos min_total segundos en la referencia.
+    """
+    previous = dict(flatten(baseline.get('results', {})))
+    comparison = {}
+    regressions = []
+    for path, value in flatten(results):
+        suffix = next((suffix for suffix in COMPARED_SUFFIXES if path.endswith(suffix)), None)
+        if suffix is None or not previous.get(path) or value is None:
+            continue
+        higher_is_better = COMPARED_SUFFIXES[suffix]
+        change = (value - previous[path]) / previous[path]
+        change = change if higher_is_better else -change
+        total = previous.get(path.rsplit('.', 1)[0] + '.total_s')
+        gated = (abs(value - previous[path]) >= ABSOLUTE_FLOORS.get(suffix, 0)
+                 and (total is None or total >= min_total))
+        comparison[path] = {"baseline": previous[path], "current": value, "change": round(change, 4), "gated": gated}
+        if gated and change < -tolerance:
+            regressions.append(path)
+    return comparison, regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de análisis, persistencia e inferencia de Zegion.")
+    parser.add_argument('--modules', type=int, default=50)
+    parser.add_argument('--files', type=int, default=5, help='Archivos de modelos por módulo')
+    parser.add_argument('--lines', type=int, default=200, help='Líneas por archivo de modelos')
+    parser.add_argument('--tests', type=int, default=1, help='Archivos de tests por módulo (0 = sin tests)')
+    parser.add_argument('--rows', type=int, default=5000, help='Filas de métricas para la persistencia')
+    parser.add_argument('--predictions', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1, help='Ejecuciones descartadas antes de medir')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--only', nargs='*', choices=BENCHMARKS, help='Ejecutar solo estos benchmarks')
+    parser.add_argument('--workdir', help='Directorio de trabajo (por defecto, uno temporal que se borra)')
+    parser.add_argument('--output', help='Guardar el informe JSON en este archivo')
+    parser.add_argument('--baseline', help='Informe de referencia con el que comparar')
+    parser.add_argument('--save-baseline', help='Guardar este informe como nueva referencia')
+    parser.add_argument('--tolerance', type=float, default=0.10, help='Empeoramiento tolerado antes de marcar regresión')
+    parser.add_argument('--min-total', type=float, default=0.05,
+                        help='Segundos medidos mínimos en la referencia para que un grupo cuente como regresión')
+    args = parser.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='zegion_bench_')
+    try:
+        benchmarks = Benchmarks(workdir, args)
+        results = {name: getattr(benchmarks, name)() for name in args.only or BENCHMARKS}
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key in CONFIG_KEYS},
+        "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                        "cpu_count": os.cpu_count(), "timestamp": time.time()},
+        "results": results,
+    }
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('config') != report['config']:
+            report['warning'] = "La referencia se generó con otra configuración; la comparación no es fiable."
+        report['comparison'], report['regressions'] = compare(results, baseline, args.tolerance, args.min_total)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    print(output)
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(output)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
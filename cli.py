@@ -0,0 +1,148 @@
+# cli.py
+"""Zegion sin interfaz: ejecuta comandos sin QApplication ni voz e imprime una línea JSON por comando.
+
+    python cli.py "analizar modulos odoo" "ejecutar tests odoo"
+    python cli.py --stdin < comandos.txt
+
+Cada línea es {"command", "ok", "result", "seconds"}; el código de salida es 1 si
+algún comando no se reconoce, falla o tiene pruebas en rojo.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from PyQt6.QtCore import Qt
+from commands import ZegionCommands, CommandRegistry, UNKNOWN_COMMAND
+from database_manager import DatabaseManager
+from instrumentation import instrumentation, flush_metrics
+from environment_analysis import EnvironmentAnalysisThread
+from odoo_analysis import OdooAnalysisThread
+from odoo_tests import OdooTestThread
+from settings import load_settings
+
+
+class HeadlessZegion(ZegionCommands):
+    """Los mismos comandos que la ventana, ejecutados de forma síncrona.
+
+    Sin event loop, los hilos de Qt no se arrancan: se llama a run() en este hilo
+    y sus señales se entregan en el acto.
+    """
+
+    def __init__(self, db_name='zegion_data.db', analysis_workers=None):
+        self.db_manager = DatabaseManager(db_name)
+        self.settings = load_settings()
+        self.analysis_workers = analysis_workers or os.cpu_count() or 1
+        self.odoo_workers = None
+        self.changed_modules = set()
+        self.dependency_graph = None
+        self.test_cache_keys = {}
+        self.cached_test_results = {}
+        self.commands = CommandRegistry(self)
+
+    def execute(self, text):
+        started = time.perf_counter()
+        try:
+            result = self.commands.dispatch(text)
+            ok = result != UNKNOWN_COMMAND and not (isinstance(result, dict) and not result.get('ok', True))
+        except Exception as e:
+            result, ok = f"{type(e).__name__}: {e}", False
+        flush_metrics(self.db_manager)
+        return {"command": text, "ok": ok, "result": result, "seconds": round(time.perf_counter() - started, 3)}
+
+    def choose_odoo_path(self):
+        return None
+
+    def analyze_environment(self):
+        analysis = {}
+        thread = EnvironmentAnalysisThread(self.odoo_workload())
+        thread.result_ready.connect(lambda result: analysis.update(json.loads(result)))
+        thread.run()
+        self.db_manager.save_environment_metrics(analysis['metrics'])
+        return dict(analysis, ok=True)
+
+    def analyze_all_odoo_paths(self, incremental=True):
+        paths = self.db_manager.get_odoo_paths()
+        if not paths:
+            return {"ok": False, "error": "No hay rutas de Odoo registradas. Por favor, añade una ruta primero."}
+
+        self.changed_modules = set()
+        results = []
+        for path_id, path in paths:
+            # Una ruta tras otra, cada una con todos los workers de análisis
+            previous_manifests = self.db_manager.get_module_manifests(path_id) if incremental else None
+            thread = OdooAnalysisThread(path, path_id, self.db_manager.db_name, previous_manifests, incremental,
+                                        self.analysis_workers, self.settings['analysis_include'],
+                                        self.settings['analysis_exclude'], use_test_cache=incremental)
+            entry = {"path": path, "modules": [], "errors": []}
+            thread.module_analyzed.connect(
+                lambda name, version, path_id, files, bytes_read, entry=entry: entry['modules'].append(
+                    {"name": name, "version": version, "files": files, "bytes_read": bytes_read}))
+            thread.module_failed.connect(lambda name, error, entry=entry: entry['errors'].append(
+                {"name": name, "error": error}))
+            thread.result_ready.connect(lambda summary, entry=entry: entry.update(summary=summary))
+            thread.run()
+            self.changed_modules.update(module['name'] for module in entry['modules'])
+            results.append(entry)
+
+        self.db_manager.prune_source_blobs()
+        self.dependency_graph = None
+        # Un módulo ilegible no detiene el análisis, pero la ejecución no cuenta como correcta
+        return {"ok": not any(entry['errors'] for entry in results), "paths": results}
+
+    def run_odoo_tests(self, force=False):
+        return self.start_odoo_tests([], force)
+
+    def start_odoo_tests(self, module_names, force=False):
+        module_names = self.pending_test_modules(module_names, force)
+        shards = []
+        done = {"summary": self.format_cached_test_results()}
+        if module_names:
+            thread = OdooTestThread(self.settings, module_names, durations=self.db_manager.get_test_durations())
+            # Los shards terminan en hilos del pool: se recogen en el acto y se guardan aquí, en el hilo de la conexión
+            thread.shard_finished.connect(lambda started, modules, result: shards.append((started, modules, result)),
+                                          Qt.ConnectionType.DirectConnection)
+            thread.result_ready.connect(lambda text: done.update(summary=text))
+            thread.run()
+            for started, modules, result in shards:
+                self.save_test_shard(started, modules, result)
+        return {
+            # Sin shards terminados ni veredictos en caché, no se probó nada: o falló antes de empezar
+            # o no hay módulos analizados
+            "ok": bool(shards or self.cached_test_results) and all(result['status'] == 'ok' for _, _, result in shards),
+            "summary": done['summary'],
+            "cached": sorted(self.cached_test_results),
+            "shards": [dict(result, modules=modules) for _, modules, result in shards],
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ejecuta comandos de Zegion sin interfaz e imprime JSON.")
+    parser.add_argument('commands', nargs='*', help='Comandos, por ejemplo: "analizar modulos odoo"')
+    parser.add_argument('--db', default='zegion_data.db', help='Base de datos de Zegion')
+    parser.add_argument('--workers', type=int, help='Procesos para el análisis de módulos')
+    parser.add_argument('--stdin', action='store_true', help='Leer además un comando por línea de la entrada estándar')
+    parser.add_argument('--list', action='store_true', help='Mostrar los comandos disponibles')
+    args = parser.parse_args(argv)
+
+    zegion = HeadlessZegion(args.db, args.workers)
+    if args.list:
+        print(json.dumps(zegion.commands.names(), ensure_ascii=False))
+        return 0
+
+    commands = list(args.commands)
+    if args.stdin:
+        commands.extend(line.strip() for line in sys.stdin if line.strip())
+    failed = False
+    for text in commands:
+        entry = zegion.execute(text)
+        failed = failed or not entry['ok']
+        print(json.dumps(entry, ensure_ascii=False, default=str), flush=True)
+    if instrumentation.capture:
+        # Un perfilado sin detener se guarda igualmente al salir
+        print(json.dumps(zegion.execute("detener perfilado"), ensure_ascii=False, default=str), flush=True)
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,383 @@
+# commands.py
+import os
+import re
+import time
+from dependency_graph import DependencyGraph, DependencyCycleError
+from instrumentation import instrumentation, flush_metrics
+from settings import save_settings, parse_setting
+from verdict_cache import manifest_hash, module_cache_keys
+
+UNKNOWN_COMMAND = "Comando no reconocido"
+
+
+def command(*names, prefix=False):
+    """Registra el método como comando; con prefix=True el resto del texto le llega como argumento."""
+    def decorator(method):
+        method.command_names = names
+        method.command_prefix = prefix
+        return method
+    return decorator
+
+
+def normalize(text):
+    return " ".join(text.lower().split())
+
+
+class CommandRegistry:
+    """Tabla de comandos de un objeto, construida a partir de los métodos marcados con @command.
+
+    Los comandos exactos se resuelven con una sola búsqueda en un diccionario; los que llevan
+    argumentos, probando como mucho tantos prefijos como palabras tenga el comando más largo.
+    """
+
+    def __init__(self, handler):
+        self.exact = {}
+        self.prefixes = {}
+        self.max_prefix_words = 0
+        # De la clase base a la derivada: una subclase puede redefinir el método de un comando
+        for klass in reversed(type(handler).__mro__):
+            for name, value in vars(klass).items():
+                for command_name in getattr(value, 'command_names', ()):
+                    key = normalize(command_name)
+                    if value.command_prefix:
+                        self.prefixes[key] = name
+                        self.max_prefix_words = max(self.max_prefix_words, len(key.split()))
+                    else:
+                        self.exact[key] = name
+        self.handler = handler
+
+    def resolve(self, text):
+        """Devuelve (método, argumentos) o (None, None) si el texto no es un comando."""
+        key = normalize(text)
+        if key in self.exact:
+            return getattr(self.handler, self.exact[key]), None
+        words = key.split()
+        for count in range(min(len(words), self.max_prefix_words), 0, -1):
+            name = self.prefixes.get(" ".join(words[:count]))
+            if name:
+                # Los argumentos conservan las mayúsculas originales (rutas, nombres de modelo)
+                parts = text.split(maxsplit=count)
+                return getattr(self.handler, name), parts[count].strip() if len(parts) > count else ""
+        return None, None
+
+    def dispatch(self, text):
+        method, args = self.resolve(text)
+        if method is None:
+            return UNKNOWN_COMMAND
+        return method() if args is None else method(args)
+
+    def names(self):
+        return sorted(self.exact) + sorted(f"{prefix} ..." for prefix in self.prefixes)
+
+
+class ZegionCommands:
+    """Comandos comunes a la ventana y al modo sin interfaz.
+
+    Requiere db_manager, settings, analysis_workers, odoo_workers, changed_modules,
+    dependency_graph, test_cache_keys y cached_test_results. Cada interfaz implementa
+    analyze_environment, analyze_all_odoo_paths, run_odoo_tests, start_odoo_tests
+    y choose_odoo_path a su manera (en segundo plano o de forma síncrona).
+    """
+
+    @command("hola")
+    def greet(self):
+        return "Hello"
+
+    @command("activar over warrior")
+    def activate(self):
+        return "Modo activo"
+
+    @command("activo")
+    def working_directory(self):
+        return f"Path de los módulos: {os.getcwd()}"
+
+    @command("aprender entorno")
+    def learn_environment(self):
+        return self.analyze_environment()
+
+    @command("add odoo path", prefix=True)
+    def add_odoo_path(self, path):
+        if not path:
+            path = self.choose_odoo_path()
+        if path:
+            self.db_manager.save_odoo_path(path)
+            return f"Nueva ruta de Odoo añadida: {path}"
+        else:
+            return "No se seleccionó ninguna ruta."
+
+    @command("list odoo paths")
+    def list_odoo_paths(self):
+        paths = self.db_manager.get_odoo_paths()
+        if paths:
+            return "Rutas de Odoo registradas:\n" + "\n".join([f"{id}: {path}" for id, path in paths])
+        else:
+            return "No hay rutas de Odoo registradas."
+
+    @command("analizar modulos odoo")
+    def analyze_modules(self):
+        return self.analyze_all_odoo_paths()
+
+    @command("analizar modulos odoo completo")
+    def analyze_modules_full(self):
+        return self.analyze_all_odoo_paths(incremental=False)
+
+    @command("workers odoo", prefix=True)
+    def set_odoo_workers(self, value):
+        if not value.isdigit() or int(value) < 1:
+            return "Número de workers de Odoo no válido."
+        self.odoo_workers = int(value)
+        return f"La puntuación del entorno considerará {self.odoo_workers} workers de Odoo."
+
+    @command("configurar workers", prefix=True)
+    def set_analysis_workers(self, value):
+        if not value.isdigit() or int(value) < 1:
+            return f"Número de workers no válido. Actual: {self.analysis_workers}"
+        self.analysis_workers = int(value)
+        return f"Análisis de módulos configurado con {self.analysis_workers} workers."
+
+    def odoo_workload(self):
+        return {"module_count": self.db_manager.get_module_stats()['module_count'], "workers": self.odoo_workers}
+
+    @command("ejecutar tests odoo")
+    def test_modules(self):
+        return self.run_odoo_tests()
+
+    @command("ejecutar tests odoo forzar")
+    def test_modules_forced(self):
+        return self.run_odoo_tests(force=True)
+
+    @command("run", prefix=True)
+    def run(self, args):
+        # Ejecución directa con los ajustes guardados, sin diálogos; "run --forzar ..." ignora la caché
+        module_names = [name for name in args.replace(",", " ").split() if name]
+        force = "--forzar" in module_names
+        return self.start_odoo_tests([name for name in module_names if name != "--forzar"], force)
+
+    def pending_test_modules(self, module_names, force=False):
+        """Módulos a ejecutar; sin módulos, los afectados por el último análisis en orden de dependencias.
+
+        Si en esta sesión no se ha analizado nada (p. ej. una ejecución aparte de cli.py) se
+        toman todos los módulos analizados y la caché de veredictos descarta los que no cambiaron.
+        Los módulos sin cambios (ni en ellos ni en sus dependencias) desde su última
+        ejecución en verde quedan en cached_test_results y no se devuelven.
+        Lanza DependencyCycleError si los módulos afectados tienen dependencias cíclicas.
+        """
+        if not module_names:
+            changed_modules = self.changed_modules or set(self.db_manager.get_module_manifests())
+            affected = self.get_dependency_graph().affected_modules(changed_modules)
+            module_names = self.get_dependency_graph().topological_order(affected)
+
+        keys = self.odoo_test_cache_keys(module_names)
+        self.test_cache_keys.update(keys)
+        self.cached_test_results = {} if force else self.db_manager.lookup_test_cache('odoo', keys)
+        return [name for name in module_names if name not in self.cached_test_results]
+
+    def odoo_test_cache_keys(self, module_names):
+        module_hashes = {module_name: manifest_hash(manifest)
+                         for module_name, manifest in self.db_manager.get_module_manifests().items()}
+        # Otro odoo-bin, configuración o plantilla invalidan los veredictos guardados
+        context = "\0".join([self.settings['odoo_bin'], self.settings['odoo_config'], self.settings['test_database']])
+        return module_cache_keys(module_names, module_hashes, self.get_dependency_graph(), context)
+
+    def format_cached_test_results(self):
+        if not self.cached_test_results:
+            return "No hay módulos analizados que probar. Ejecuta 'analizar modulos odoo' primero."
+        return (f"{len(self.cached_test_results)} módulos sin cambios desde su última ejecución en verde (caché): "
+                f"{', '.join(sorted(self.cached_test_results))}")
+
+    def save_test_shard(self, started, modules, result):
+        self.db_manager.save_test_run(started, result['duration'], modules, result['status'], result['return_code'],
+                                      result['records'])
+        for module_name in modules:
+            records = [record for record in result['records'] if record['module'] == module_name]
+            failed = sum(record['status'] != 'passed' for record in records)
+            summary = f"{result['status']}: {len(records)} pruebas, {failed} fallidas"
+            self.db_manager.update_test_result(module_name, summary)
+            # Solo se guardan los veredictos en verde; un fallo siempre se vuelve a ejecutar
+            if result['status'] == 'ok' and module_name in self.test_cache_keys:
+                self.db_manager.save_test_cache('odoo', [(module_name, self.test_cache_keys[module_name], summary)])
+
+    @command("invalidar cache tests", prefix=True)
+    def invalidate_test_cache(self, module_name):
+        removed = self.db_manager.invalidate_test_cache(module_name or None)
+        return f"Caché de pruebas invalidada: {removed} entradas eliminadas."
+
+    @command("estado cache tests")
+    def test_cache_status(self):
+        stats = self.db_manager.get_test_cache_stats()
+        if not stats:
+            return "La caché de pruebas todavía no se ha usado."
+        lines = ["Caché de pruebas:"]
+        for kind, entries, hits, misses in stats:
+            ratio = hits / (hits + misses) * 100 if hits + misses else 0
+            lines.append(f"  {kind}: {entries} entradas, {hits} aciertos, {misses} fallos ({ratio:.0f}% de aciertos)")
+        return "\n".join(lines)
+
+    @command("rendimiento")
+    def performance_summary(self):
+        flush_metrics(self.db_manager)
+        return self.format_performance("esta sesión", self.db_manager.get_performance_summary(instrumentation.session))
+
+    @command("rendimiento historico")
+    def performance_history(self):
+        flush_metrics(self.db_manager)
+        return self.format_performance("todas las sesiones", self.db_manager.get_performance_summary())
+
+    def format_performance(self, scope, rows):
+        if not rows:
+            return f"No hay métricas de rendimiento ({scope})."
+        lines = [f"Rendimiento ({scope}):"]
+        for kind, name, calls, total, peak in rows:
+            if kind == 'span':
+                lines.append(f"  {name}: {calls} llamadas, total {total:.2f} s, media {total / calls * 1000:.1f} ms, "
+                             f"máx {peak * 1000:.1f} ms")
+            elif name.startswith('bytes'):
+                lines.append(f"  {name}: {total / (1024 ** 2):.2f} MB")
+            else:
+                lines.append(f"  {name}: {int(total)}")
+        return "\n".join(lines)
+
+    @command("iniciar perfilado", prefix=True)
+    def start_profiling(self, label):
+        if not instrumentation.start_capture(label or time.strftime('%Y-%m-%d %H:%M:%S')):
+            return "Ya hay un perfilado en curso. Usa 'detener perfilado' para guardarlo."
+        return "Perfilado iniciado (cProfile y tracemalloc). Ejecuta los comandos a medir y luego 'detener perfilado'."
+
+    @command("detener perfilado")
+    def stop_profiling(self):
+        capture = instrumentation.stop_capture()
+        if capture is None:
+            return "No hay ningún perfilado en curso."
+        capture_id = self.db_manager.save_profile_capture(capture)
+        flush_metrics(self.db_manager)
+        return (f"Perfilado {capture_id} guardado ({capture['label']}): {capture['duration']:.1f} s, "
+                f"memoria máxima {capture['peak_memory'] / (1024 ** 2):.1f} MB. Usa 'ver perfil {capture_id}'.")
+
+    @command("perfiles")
+    def list_profiles(self):
+        captures = self.db_manager.get_profile_captures()
+        if not captures:
+            return "No hay perfilados guardados."
+        return "Perfilados guardados:\n" + "\n".join(
+            f"  {capture_id}: {label} ({time.strftime('%Y-%m-%d %H:%M', time.localtime(started))}, "
+            f"{duration:.1f} s, {(peak_memory or 0) / (1024 ** 2):.1f} MB)"
+            for capture_id, started, duration, label, peak_memory in captures)
+
+    @command("ver perfil", prefix=True)
+    def show_profile(self, value):
+        profile = self.db_manager.get_profile_report(int(value) if value.isdigit() else None)
+        if not profile:
+            return "No hay perfilados guardados."
+        capture_id, label, report = profile
+        return f"Perfilado {capture_id} ({label}):\n{report}"
+
+    @command("ajustes")
+    def show_settings(self):
+        return "Ajustes:\n" + "\n".join(f"  {key}: {value}" for key, value in self.settings.items())
+
+    @command("ajustar", prefix=True)
+    def change_setting(self, args):
+        parts = args.split(maxsplit=1)
+        if len(parts) < 2:
+            return "Uso: ajustar <clave> <valor>"
+        key, value = parts[0], parts[1].strip()
+        try:
+            self.settings[key] = parse_setting(key, value)
+        except KeyError:
+            return f"Ajuste desconocido: {key}. Disponibles: {', '.join(self.settings)}"
+        except ValueError:
+            return f"Valor no válido para {key}: {value}"
+        save_settings(self.settings)
+        return f"Ajuste {key} actualizado: {self.settings[key]}"
+
+    @command("quien hereda", prefix=True)
+    def find_models_inheriting(self, model_name):
+        if not model_name:
+            return "Indique el modelo, por ejemplo: quien hereda sale.order"
+        rows = self.db_manager.find_models_inheriting(model_name)
+        if not rows:
+            return f"Ningún módulo analizado hereda {model_name}."
+        return f"Módulos que heredan {model_name}:\n" + "\n".join(
+            [f"{module_name} ({class_name} en {file_path})" for module_name, class_name, file_path, path in rows])
+
+    @command("quien define campo", prefix=True)
+    def find_field_definitions(self, field_name):
+        if not field_name:
+            return "Indique el campo, por ejemplo: quien define campo partner_id"
+        rows = self.db_manager.find_field_definitions(field_name)
+        if not rows:
+            return f"Ningún módulo analizado define el campo {field_name}."
+        return f"Definiciones del campo {field_name}:\n" + "\n".join(
+            [f"{module_name}: {model_name} ({field_type}) en {file_path}" for module_name, model_name, field_type, file_path in rows])
+
+    @command("quien define metodo", prefix=True)
+    def find_method_definitions(self, method_name):
+        if not method_name:
+            return "Indique el método, por ejemplo: quien define metodo action_confirm"
+        rows = self.db_manager.find_method_definitions(method_name)
+        if not rows:
+            return f"Ningún módulo analizado define el método {method_name}."
+        return f"Definiciones del método {method_name}:\n" + "\n".join(
+            [f"{module_name}: {model_name} en {file_path}" for module_name, model_name, file_path in rows])
+
+    @command("buscar", prefix=True)
+    def search_sources(self, text):
+        # "buscar <texto> [página N]"
+        page = 1
+        match = re.search(r'\s+p[aá]gina\s+(\d+)$', text, re.IGNORECASE)
+        if match:
+            page = max(1, int(match.group(1)))
+            text = text[:match.start()].strip()
+        if not text:
+            return "Indique el texto a buscar, por ejemplo: buscar partner_id página 2"
+        page_size = 20
+        started = time.perf_counter()
+        total, rows = self.db_manager.search_sources(text, page_size, (page - 1) * page_size)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not total:
+            return f"No se encontró '{text}' en el código analizado."
+        pages = (total + page_size - 1) // page_size
+        if page > pages:
+            return f"La página {page} no existe: '{text}' tiene {total} archivos en {pages} páginas."
+        lines = [f"'{text}': {total} archivos, página {page} de {pages} ({elapsed_ms:.0f} ms)"]
+        lines.extend(f"{module_name}/{file_path}:{line_number}: {line}" for module_name, file_path, line_number, line in rows)
+        return "\n".join(lines)
+
+    def get_dependency_graph(self):
+        # Se reconstruye solo tras un nuevo análisis; los cierres transitivos quedan en caché
+        if self.dependency_graph is None:
+            self.dependency_graph = DependencyGraph.from_database(self.db_manager)
+        return self.dependency_graph
+
+    @command("impacto", prefix=True)
+    def module_impact(self, module_name):
+        if not module_name:
+            return "Indique el módulo, por ejemplo: impacto sale"
+        graph = self.get_dependency_graph()
+        dependencies = graph.transitive_dependencies(module_name)
+        dependents = graph.transitive_dependents(module_name)
+        try:
+            order = graph.topological_order(dependents | {module_name})
+        except DependencyCycleError as e:
+            return str(e)
+        return (
+            f"Impacto del módulo {module_name}:\n"
+            f"  Dependencias ({len(dependencies)}): {', '.join(sorted(dependencies)) or '-'}\n"
+            f"  Módulos afectados ({len(dependents)}): {', '.join(sorted(dependents)) or '-'}\n"
+            f"  Orden de pruebas: {', '.join(order)}"
+        )
+
+    @command("tendencia entorno", prefix=True)
+    def environment_trend(self, value):
+        days = int(value) if value.isdigit() and int(value) > 0 else 30
+        # Para periodos largos se agrupa por día; para uno corto, por hora
+        bucket_seconds = 86400 if days > 2 else 3600
+        rows = self.db_manager.get_environment_metrics_downsampled(
+            bucket_seconds, ['cpu_usage_percent', 'memory_percent', 'disk_percent'], start=time.time() - days * 86400)
+        if not rows:
+            return f"No hay métricas del entorno en los últimos {days} días."
+        date_format = '%Y-%m-%d' if bucket_seconds == 86400 else '%Y-%m-%d %H:00'
+        return f"Tendencia del entorno ({days} días):\n" + "\n".join(
+            f"{time.strftime(date_format, time.gmtime(bucket))}: CPU {cpu:.1f}%, memoria {memory:.1f}%, "
+            f"disco {disk:.1f}% ({samples} muestras)"
+            for bucket, samples, cpu, memory, disk in rows)
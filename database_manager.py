@@ -1,7 +1,14 @@
 # database_manager.py
+import queue
 import sqlite3
-import json
+import threading
+import time
+import zlib
+from contextlib import contextmanager
 from PyQt6.QtCore import QObject
+from instrumentation import span, count
+from migrations import MIGRATIONS, ENVIRONMENT_METRIC_COLUMNS, ENVIRONMENT_METRIC_COLUMNS_V7
+from module_manifest import decode_source
 
 class DatabaseManager(QObject):
     def __init__(self, db_name='zegion_data.db'):
@@ -9,81 +16,531 @@ class DatabaseManager(QObject):
         self.db_name = db_name
         self.conn = None
         self.cursor = None
+        self.batch_depth = 0
         self.connect()
-        self.create_tables()
-        self.update_tables()
+        self.migrate()
+        # total_changes cuenta las filas tocadas por la conexión desde que se abrió
+        self.committed_changes = self.conn.total_changes
 
     def connect(self):
-        self.conn = sqlite3.connect(self.db_name)
+        # Las conexiones del ConnectionPool pasan de un hilo a otro, siempre usadas por uno solo a la vez
+        self.conn = sqlite3.connect(self.db_name, timeout=30, check_same_thread=False)
         self.cursor = self.conn.cursor()
+        # WAL permite lecturas concurrentes y reduce los fsync por transacción
+        self.cursor.execute('PRAGMA journal_mode=WAL')
+        self.cursor.execute('PRAGMA synchronous=NORMAL')
+        self.cursor.execute('PRAGMA temp_store=MEMORY')
+        self.cursor.execute('PRAGMA cache_size=-20000')
 
-    def create_tables(self):
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS commands_history
-            (id INTEGER PRIMARY KEY, command TEXT, response TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS environment_analysis
-            (id INTEGER PRIMARY KEY, analysis_data TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS odoo_paths
-            (id INTEGER PRIMARY KEY, path TEXT UNIQUE)
-        ''')
-        self.cursor.execute('''
-            CREATE TABLE IF NOT EXISTS odoo_modules
-            (id INTEGER PRIMARY KEY, module_name TEXT, module_path TEXT, code_content TEXT, 
-             test_content TEXT, test_result TEXT, version TEXT, path_id INTEGER,
-             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-             FOREIGN KEY(path_id) REFERENCES odoo_paths(id))
-        ''')
-        self.conn.commit()
+    @contextmanager
+    def batch(self):
+        """Agrupa todas las escrituras del bloque en una sola transacción."""
+        self.batch_depth += 1
+        try:
+            yield self
+        except Exception:
+            self.batch_depth -= 1
+            if not self.batch_depth:
+                self.rollback()
+            raise
+        self.batch_depth -= 1
+        if not self.batch_depth:
+            self.commit_transaction()
+
+    def commit(self):
+        if not self.batch_depth:
+            self.commit_transaction()
+
+    def commit_transaction(self):
+        with span('db.commit'):
+            self.conn.commit()
+        count('db.rows_written', self.conn.total_changes - self.committed_changes)
+        self.committed_changes = self.conn.total_changes
+
+    def rollback(self):
+        self.conn.rollback()
+        self.committed_changes = self.conn.total_changes
 
-    def update_tables(self):
-        columns_to_add = ['code_content', 'test_content', 'test_result', 'version', 'path_id']
-        for column in columns_to_add:
-            self.cursor.execute(f"PRAGMA table_info(odoo_modules)")
-            columns = [row[1] for row in self.cursor.fetchall()]
-            if column not in columns:
-                self.cursor.execute(f"ALTER TABLE odoo_modules ADD COLUMN {column} TEXT")
-        self.conn.commit()
+    def migrate(self):
+        self.cursor.execute('PRAGMA user_version')
+        if self.cursor.fetchone()[0] >= MIGRATIONS[-1][0]:
+            return
+        for version, migration in MIGRATIONS:
+            # BEGIN IMMEDIATE toma el bloqueo de escritura antes de leer la versión: si otro proceso
+            # abrió la misma base a la vez, aquí se espera y se ve la migración que ya aplicó
+            self.cursor.execute('BEGIN IMMEDIATE')
+            try:
+                self.cursor.execute('PRAGMA user_version')
+                if version > self.cursor.fetchone()[0]:
+                    migration(self.cursor)
+                    self.cursor.execute(f'PRAGMA user_version = {version}')
+                self.conn.commit()
+            except Exception:
+                self.conn.rollback()
+                raise
 
     def save_command_history(self, command, response):
         self.cursor.execute('INSERT INTO commands_history (command, response) VALUES (?, ?)', (command, response))
-        self.conn.commit()
+        self.commit()
 
-    def save_environment_analysis(self, analysis_data):
-        self.cursor.execute('INSERT INTO environment_analysis (analysis_data) VALUES (?)', (json.dumps(analysis_data),))
-        self.conn.commit()
+    def save_environment_metrics(self, metrics, timestamp=None):
+        self.save_environment_metrics_batch([(timestamp or time.time(), metrics)])
+
+    def save_environment_metrics_batch(self, samples):
+        # Cada muestra guarda el número de módulos de ese momento, salvo que ya lo traiga
+        module_stats = self.get_module_stats()
+        placeholders = ', '.join('?' for _ in range(len(ENVIRONMENT_METRIC_COLUMNS) + 1))
+        self.cursor.executemany(f'''
+            INSERT INTO environment_metrics (timestamp, {', '.join(ENVIRONMENT_METRIC_COLUMNS)}) VALUES ({placeholders})
+        ''', [[timestamp] + [metrics.get(column, module_stats.get(column)) for column in ENVIRONMENT_METRIC_COLUMNS]
+              for timestamp, metrics in samples])
+        self.commit()
 
     def save_odoo_path(self, path):
         self.cursor.execute('INSERT OR IGNORE INTO odoo_paths (path) VALUES (?)', (path,))
-        self.conn.commit()
-        return self.cursor.lastrowid
+        self.commit()
+        self.cursor.execute('SELECT id FROM odoo_paths WHERE path = ?', (path,))
+        return self.cursor.fetchone()[0]
 
     def get_odoo_paths(self):
         self.cursor.execute('SELECT id, path FROM odoo_paths')
         return self.cursor.fetchall()
 
-    def save_odoo_module(self, module_name, module_path, code_content, test_content, version, path_id):
+    def save_odoo_module(self, module_name, module_path, version, path_id):
         self.cursor.execute('''
-            INSERT OR REPLACE INTO odoo_modules 
-            (module_name, module_path, code_content, test_content, version, path_id) 
+            INSERT INTO odoo_modules
+            (module_name, module_path, version, path_id)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(path_id, module_name) DO UPDATE SET
+                module_path = excluded.module_path,
+                version = excluded.version,
+                timestamp = CURRENT_TIMESTAMP
+        ''', (module_name, module_path, version, path_id))
+        self.commit()
+
+    def get_module_manifests(self, path_id=None):
+        if path_id is None:
+            # Todas las rutas; si un módulo aparece en varias, prevalecen los archivos de la última
+            self.cursor.execute('''
+                SELECT module_name, file_path, mtime, size, hash FROM odoo_module_files ORDER BY path_id
+            ''')
+        else:
+            self.cursor.execute('''
+                SELECT module_name, file_path, mtime, size, hash FROM odoo_module_files WHERE path_id = ?
+            ''', (path_id,))
+        manifests = {}
+        for module_name, file_path, mtime, size, file_hash in self.cursor.fetchall():
+            manifests.setdefault(module_name, {})[file_path] = (mtime, size, file_hash)
+        return manifests
+
+    def save_module_manifest(self, module_name, path_id, manifest):
+        self.cursor.execute('DELETE FROM odoo_module_files WHERE path_id = ? AND module_name = ?', (path_id, module_name))
+        self.cursor.executemany('''
+            INSERT INTO odoo_module_files (path_id, module_name, file_path, mtime, size, hash)
             VALUES (?, ?, ?, ?, ?, ?)
-        ''', (module_name, module_path, code_content, test_content, version, path_id))
-        self.conn.commit()
+        ''', [(path_id, module_name, file_path, mtime, size, file_hash)
+              for file_path, (mtime, size, file_hash) in manifest.items()])
+        self.commit()
+
+    def save_file_index(self, path_id, module_name, file_models):
+        """Reemplaza el índice de modelos de los archivos dados ({archivo: modelos})."""
+        for file_path, models in file_models.items():
+            model_ids = '(SELECT id FROM odoo_models WHERE path_id = ? AND module_name = ? AND file_path = ?)'
+            key = (path_id, module_name, file_path)
+            self.cursor.execute(f'DELETE FROM odoo_model_inherits WHERE model_id IN {model_ids}', key)
+            self.cursor.execute(f'DELETE FROM odoo_model_fields WHERE model_id IN {model_ids}', key)
+            self.cursor.execute(f'DELETE FROM odoo_model_methods WHERE model_id IN {model_ids}', key)
+            self.cursor.execute('DELETE FROM odoo_models WHERE path_id = ? AND module_name = ? AND file_path = ?', key)
+            for model in models:
+                self.cursor.execute('''
+                    INSERT INTO odoo_models (path_id, module_name, file_path, class_name, model_name)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (path_id, module_name, file_path, model['class_name'], model['model_name']))
+                model_id = self.cursor.lastrowid
+                self.cursor.executemany('INSERT INTO odoo_model_inherits (model_id, inherit_name) VALUES (?, ?)',
+                                        [(model_id, name) for name in model['inherits']])
+                self.cursor.executemany('INSERT INTO odoo_model_fields (model_id, field_name, field_type) VALUES (?, ?, ?)',
+                                        [(model_id, name, kind) for name, kind in model['fields']])
+                self.cursor.executemany('INSERT INTO odoo_model_methods (model_id, method_name) VALUES (?, ?)',
+                                        [(model_id, name) for name in model['methods']])
+        self.commit()
+
+    def clear_module_index(self, path_id, module_name):
+        """Elimina del índice de modelos todos los archivos del módulo."""
+        self.cursor.execute('SELECT DISTINCT file_path FROM odoo_models WHERE path_id = ? AND module_name = ?',
+                            (path_id, module_name))
+        self.save_file_index(path_id, module_name, {file_path: [] for file_path, in self.cursor.fetchall()})
+
+    def get_path_modules(self, path_id):
+        self.cursor.execute('''
+            SELECT module_name FROM odoo_modules WHERE path_id = ?
+            UNION SELECT module_name FROM odoo_module_files WHERE path_id = ?
+        ''', (path_id, path_id))
+        return {module_name for module_name, in self.cursor.fetchall()}
+
+    def remove_modules(self, path_id, module_names):
+        """Borra todo lo guardado de los módulos; sus blobs se liberan en el siguiente prune_source_blobs."""
+        with self.batch():
+            for module_name in module_names:
+                self.clear_module_index(path_id, module_name)
+                for table in ['odoo_modules', 'odoo_module_files', 'odoo_module_depends']:
+                    self.cursor.execute(f'DELETE FROM {table} WHERE path_id = ? AND module_name = ?',
+                                        (path_id, module_name))
+
+    def save_module_depends(self, path_id, module_name, depends):
+        self.cursor.execute('DELETE FROM odoo_module_depends WHERE path_id = ? AND module_name = ?', (path_id, module_name))
+        self.cursor.executemany('''
+            INSERT OR IGNORE INTO odoo_module_depends (path_id, module_name, depends_on) VALUES (?, ?, ?)
+        ''', [(path_id, module_name, depend) for depend in depends])
+        self.commit()
+
+    def find_models_inheriting(self, model_name):
+        self.cursor.execute('''
+            SELECT DISTINCT m.module_name, m.class_name, m.file_path, p.path
+            FROM odoo_model_inherits i
+            JOIN odoo_models m ON m.id = i.model_id
+            JOIN odoo_paths p ON p.id = m.path_id
+            WHERE i.inherit_name = ?
+            ORDER BY m.module_name
+        ''', (model_name,))
+        return self.cursor.fetchall()
+
+    def find_field_definitions(self, field_name):
+        self.cursor.execute('''
+            SELECT m.module_name, m.model_name, f.field_type, m.file_path
+            FROM odoo_model_fields f
+            JOIN odoo_models m ON m.id = f.model_id
+            WHERE f.field_name = ?
+            ORDER BY m.module_name
+        ''', (field_name,))
+        return self.cursor.fetchall()
+
+    def find_method_definitions(self, method_name):
+        self.cursor.execute('''
+            SELECT m.module_name, m.model_name, m.file_path
+            FROM odoo_model_methods d
+            JOIN odoo_models m ON m.id = d.model_id
+            WHERE d.method_name = ?
+            ORDER BY m.module_name
+        ''', (method_name,))
+        return self.cursor.fetchall()
+
+    def get_module_depends(self, path_id=None):
+        if path_id is None:
+            self.cursor.execute('SELECT path_id, module_name, depends_on FROM odoo_module_depends')
+        else:
+            self.cursor.execute('SELECT path_id, module_name, depends_on FROM odoo_module_depends WHERE path_id = ?', (path_id,))
+        return self.cursor.fetchall()
+
+    def save_source_blobs(self, blobs):
+        with self.batch():
+            for file_hash, data in blobs.items():
+                self.cursor.execute('''
+                    INSERT OR IGNORE INTO source_blobs (hash, size, data) VALUES (?, ?, ?)
+                ''', (file_hash, len(data), zlib.compress(data)))
+                # Solo el contenido nuevo entra en el índice de búsqueda
+                if self.cursor.rowcount == 1:
+                    self.cursor.execute('INSERT INTO source_search_docs (hash) VALUES (?)', (file_hash,))
+                    self.cursor.execute('INSERT INTO source_search (rowid, content) VALUES (?, ?)',
+                                        (self.cursor.lastrowid, decode_source(data)))
+
+    def prune_source_blobs(self):
+        with self.batch():
+            # Un índice sin contenido solo borra una fila si recibe el mismo texto con el que se indexó
+            self.cursor.execute('''
+                SELECT d.id, b.data FROM source_search_docs d JOIN source_blobs b ON b.hash = d.hash
+                WHERE d.hash NOT IN (SELECT hash FROM odoo_module_files)
+            ''')
+            for doc_id, data in self.cursor.fetchall():
+                self.cursor.execute("INSERT INTO source_search (source_search, rowid, content) VALUES ('delete', ?, ?)",
+                                    (doc_id, decode_source(zlib.decompress(data))))
+            self.cursor.execute('''
+                DELETE FROM source_search_docs WHERE hash NOT IN (SELECT hash FROM odoo_module_files)
+            ''')
+            self.cursor.execute('''
+                DELETE FROM source_blobs WHERE hash NOT IN (SELECT hash FROM odoo_module_files)
+            ''')
+
+    def search_sources(self, text, limit=20, offset=0):
+        """Busca en el código indexado; devuelve (total, [(módulo, archivo, línea, texto)]) por relevancia.
+
+        Cada palabra se busca como término exacto (sin sintaxis FTS5) y todas deben aparecer en el archivo.
+        """
+        terms = text.split()
+        if not terms:
+            return 0, []
+        query = " ".join('"' + term.replace('"', '""') + '"' for term in terms)
+        matches = '''
+            FROM source_search s
+            JOIN source_search_docs d ON d.id = s.rowid
+            JOIN odoo_module_files f ON f.hash = d.hash
+            WHERE source_search MATCH ?
+        '''
+        self.cursor.execute(f'SELECT COUNT(*) {matches}', (query,))
+        total = self.cursor.fetchone()[0]
+        # El índice no guarda el texto: solo se descomprimen los blobs de la página mostrada
+        self.cursor.execute(f'''
+            SELECT r.module_name, r.file_path, b.data FROM (
+                SELECT f.module_name, f.file_path, d.hash, bm25(source_search) AS rank {matches}
+                ORDER BY rank, f.module_name, f.file_path LIMIT ? OFFSET ?
+            ) r JOIN source_blobs b ON b.hash = r.hash
+            ORDER BY r.rank, r.module_name, r.file_path
+        ''', (query, limit, offset))
+        lowered = [term.lower() for term in terms]
+        results = []
+        for module_name, file_path, data in self.cursor.fetchall():
+            line_number, line = first_matching_line(decode_source(zlib.decompress(data)), lowered)
+            results.append((module_name, file_path, line_number, line))
+        return total, results
+
+    def update_test_result(self, module_name, test_result, path_id=None):
+        if path_id is None:
+            self.cursor.execute('''
+                UPDATE odoo_modules SET test_result = ? WHERE module_name = ?
+            ''', (test_result, module_name))
+        else:
+            self.cursor.execute('''
+                UPDATE odoo_modules SET test_result = ? WHERE path_id = ? AND module_name = ?
+            ''', (test_result, path_id, module_name))
+        self.commit()
+
+    def save_test_run(self, started, duration, modules, status, return_code, records):
+        """Guarda una ejecución de odoo-bin y sus pruebas; devuelve el id de la ejecución."""
+        with self.batch():
+            self.cursor.execute('''
+                INSERT INTO odoo_test_runs (started, duration, modules, status, return_code) VALUES (?, ?, ?, ?, ?)
+            ''', (started, duration, ",".join(modules), status, return_code))
+            run_id = self.cursor.lastrowid
+            self.cursor.executemany('''
+                INSERT INTO odoo_test_results (run_id, module_name, test_class, test_method, status, duration, message)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', [(run_id, record['module'], record['test_class'], record['test_method'], record['status'],
+                   record.get('duration'), record.get('message')) for record in records])
+        return run_id
+
+    def lookup_test_cache(self, kind, keys):
+        """Devuelve {módulo: resumen} de los módulos cuya clave {módulo: clave} tiene un veredicto guardado."""
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" * len(keys))
+        self.cursor.execute(f'''
+            SELECT module_name, cache_key, summary FROM test_cache WHERE kind = ? AND cache_key IN ({placeholders})
+        ''', [kind, *keys.values()])
+        cached = {module_name: summary for module_name, cache_key, summary in self.cursor.fetchall()
+                  if keys.get(module_name) == cache_key}
+        with self.batch():
+            self.cursor.executemany('UPDATE test_cache SET hits = hits + 1 WHERE kind = ? AND cache_key = ?',
+                                    [(kind, keys[module_name]) for module_name in cached])
+            self.cursor.execute('''
+                INSERT INTO test_cache_stats (kind, hits, misses) VALUES (?, ?, ?)
+                ON CONFLICT(kind) DO UPDATE SET hits = hits + excluded.hits, misses = misses + excluded.misses
+            ''', (kind, len(cached), len(keys) - len(cached)))
+        return cached
+
+    def save_test_cache(self, kind, entries):
+        self.cursor.executemany('''
+            INSERT INTO test_cache (kind, cache_key, module_name, summary, created) VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(kind, cache_key) DO UPDATE SET summary = excluded.summary, created = excluded.created
+        ''', [(kind, cache_key, module_name, summary, time.time()) for module_name, cache_key, summary in entries])
+        self.commit()
+
+    def invalidate_test_cache(self, module_name=None):
+        if module_name is None:
+            self.cursor.execute('DELETE FROM test_cache')
+        else:
+            self.cursor.execute('DELETE FROM test_cache WHERE module_name = ?', (module_name,))
+        removed = self.cursor.rowcount
+        self.commit()
+        return removed
 
-    def update_test_result(self, module_name, test_result):
+    def get_test_cache_stats(self):
+        """Filas (tipo, entradas, aciertos, fallos) de la caché de pruebas."""
         self.cursor.execute('''
-            UPDATE odoo_modules SET test_result = ? WHERE module_name = ?
-        ''', (test_result, module_name))
-        self.conn.commit()
+            SELECT s.kind, (SELECT COUNT(*) FROM test_cache c WHERE c.kind = s.kind), s.hits, s.misses
+            FROM test_cache_stats s ORDER BY s.kind
+        ''')
+        return self.cursor.fetchall()
+
+    def get_test_durations(self):
+        """Segundos de pruebas por módulo, promediados entre las ejecuciones registradas."""
+        self.cursor.execute('''
+            SELECT module_name, SUM(duration) / COUNT(DISTINCT run_id) FROM odoo_test_results
+            WHERE duration IS NOT NULL GROUP BY module_name
+        ''')
+        return dict(self.cursor.fetchall())
+
+    def save_resource_samples(self, samples):
+        self.cursor.executemany('''
+            INSERT INTO resource_samples
+            (timestamp, kind, name, cpu_percent, memory_mb, read_bytes_per_s, write_bytes_per_s)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', samples)
+        self.commit()
 
-    def get_last_environment_analysis(self):
-        self.cursor.execute('SELECT analysis_data FROM environment_analysis ORDER BY timestamp DESC LIMIT 1')
+    def get_resource_summary(self, start=None, end=None):
+        self.cursor.execute('''
+            SELECT kind, name, COUNT(*), AVG(cpu_percent), MAX(memory_mb), AVG(read_bytes_per_s), AVG(write_bytes_per_s)
+            FROM resource_samples
+            WHERE timestamp BETWEEN ? AND ?
+            GROUP BY kind, name ORDER BY kind, name
+        ''', (start or 0, end or time.time()))
+        return self.cursor.fetchall()
+
+    def get_last_environment_metrics(self):
+        self.cursor.execute(f'SELECT {", ".join(ENVIRONMENT_METRIC_COLUMNS)} FROM environment_metrics ORDER BY id DESC LIMIT 1')
         result = self.cursor.fetchone()
-        return json.loads(result[0]) if result else None
+        return dict(zip(ENVIRONMENT_METRIC_COLUMNS, result)) if result else None
+
+    def get_environment_metrics(self, columns=None, start=None, end=None, require=None):
+        """Devuelve filas (timestamp, *columnas) en orden cronológico dentro de [start, end].
+
+        require lista columnas que no pueden ser NULL en las filas devueltas. Por defecto son las
+        pedidas que también tienen las filas migradas de los análisis antiguos, que dejan en NULL
+        las columnas añadidas después.
+        """
+        columns = self.metric_columns(columns)
+        if require is None:
+            require = [column for column in columns if column in ENVIRONMENT_METRIC_COLUMNS_V7]
+        conditions = "".join(f" AND {column} IS NOT NULL" for column in self.metric_columns(require))
+        self.cursor.execute(f'''
+            SELECT timestamp, {", ".join(columns)} FROM environment_metrics
+            WHERE timestamp BETWEEN ? AND ?{conditions} ORDER BY timestamp
+        ''', (start or 0, end or time.time()))
+        return self.cursor.fetchall()
+
+    def get_environment_metrics_downsampled(self, bucket_seconds, columns=None, start=None, end=None):
+        """Promedia las métricas por intervalos de bucket_seconds: (inicio, muestras, *promedios).
+
+        Los intervalos se cortan en hora local (un día va de medianoche a medianoche local) y su
+        inicio se devuelve como segundos de reloj local: se formatea con time.gmtime, no localtime.
+        """
+        columns = self.metric_columns(columns)
+        averages = ", ".join(f"AVG({column})" for column in columns)
+        self.cursor.execute(f'''
+            SELECT CAST(strftime('%s', timestamp, 'unixepoch', 'localtime') AS INTEGER) / ? * ? AS bucket,
+                   COUNT(*), {averages}
+            FROM environment_metrics
+            WHERE timestamp BETWEEN ? AND ?
+            GROUP BY bucket ORDER BY bucket
+        ''', (bucket_seconds, bucket_seconds, start or 0, end or time.time()))
+        return self.cursor.fetchall()
+
+    def metric_columns(self, columns):
+        # Los nombres de columna se interpolan en el SQL: solo se aceptan los del esquema
+        columns = ENVIRONMENT_METRIC_COLUMNS if columns is None else columns
+        unknown = set(columns) - set(ENVIRONMENT_METRIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"Métricas desconocidas: {', '.join(sorted(unknown))}")
+        return list(columns)
+
+    def get_module_stats(self):
+        self.cursor.execute('''
+            SELECT COUNT(*), COUNT(NULLIF(test_result, '')) FROM odoo_modules
+        ''')
+        module_count, tested_module_count = self.cursor.fetchone()
+        self.cursor.execute('SELECT COUNT(*) FROM odoo_module_files')
+        return {
+            "module_count": module_count,
+            "tested_module_count": tested_module_count,
+            "module_file_count": self.cursor.fetchone()[0],
+        }
 
     def get_odoo_modules(self):
         self.cursor.execute('SELECT module_name, module_path FROM odoo_modules')
-        return self.cursor.fetchall()
\ No newline at end of file
+        return self.cursor.fetchall()
+
+    def save_performance_metrics(self, session, data):
+        timestamp = time.time()
+        rows = [(timestamp, session, 'span', name, calls, seconds, peak)
+                for name, (calls, seconds, peak) in data['spans'].items()]
+        rows += [(timestamp, session, 'counter', name, 1, value, None) for name, value in data['counters'].items()]
+        self.cursor.executemany('''
+            INSERT INTO performance_metrics (timestamp, session, kind, name, calls, total, max_value)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        self.commit()
+
+    def get_performance_summary(self, session=None):
+        """Filas (tipo, nombre, llamadas, total, máximo) de una sesión, o de todas si session es None."""
+        self.cursor.execute('''
+            SELECT kind, name, SUM(calls), SUM(total), MAX(max_value) FROM performance_metrics
+            WHERE ? IS NULL OR session = ?
+            GROUP BY kind, name ORDER BY kind DESC, SUM(total) DESC
+        ''', (session, session))
+        return self.cursor.fetchall()
+
+    def save_profile_capture(self, capture):
+        self.cursor.execute('''
+            INSERT INTO profile_captures (started, duration, label, peak_memory, report) VALUES (?, ?, ?, ?, ?)
+        ''', (capture['started'], capture['duration'], capture['label'], capture['peak_memory'], capture['report']))
+        self.commit()
+        return self.cursor.lastrowid
+
+    def get_profile_captures(self, limit=10):
+        self.cursor.execute('''
+            SELECT id, started, duration, label, peak_memory FROM profile_captures ORDER BY id DESC LIMIT ?
+        ''', (limit,))
+        return self.cursor.fetchall()
+
+    def get_profile_report(self, capture_id=None):
+        # Sin id, la captura más reciente
+        self.cursor.execute('''
+            SELECT id, label, report FROM profile_captures WHERE ? IS NULL OR id = ? ORDER BY id DESC LIMIT 1
+        ''', (capture_id, capture_id))
+        return self.cursor.fetchone()
+
+def first_matching_line(content, terms):
+    # La primera línea con más términos de la búsqueda; FTS5 no da la posición dentro del archivo
+    best = (0, 0, "")
+    for line_number, line in enumerate(content.splitlines(), 1):
+        found = sum(term in line.lower() for term in terms)
+        if found > best[0]:
+            best = (found, line_number, line.strip())
+            if found == len(terms):
+                break
+    return best[1], best[2]
+
+
+class ConnectionPool:
+    """Reparte conexiones a una misma base de datos entre los hilos de trabajo.
+
+    Cada conexión la usa un solo hilo a la vez y vuelve al pool al salir de
+    connection(); size limita cuántas hay abiertas simultáneamente.
+    """
+    pools = {}
+    pools_lock = threading.Lock()
+
+    def __init__(self, db_name, size=8):
+        self.db_name = db_name
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+
+    @classmethod
+    def for_database(cls, db_name):
+        with cls.pools_lock:
+            if db_name not in cls.pools:
+                cls.pools[db_name] = cls(db_name)
+            return cls.pools[db_name]
+
+    @contextmanager
+    def connection(self):
+        with self.slots:
+            try:
+                db_manager = self.idle.get_nowait()
+            except queue.Empty:
+                db_manager = DatabaseManager(self.db_name)
+            try:
+                yield db_manager
+            finally:
+                # Una transacción a medias no debe filtrarse al siguiente hilo que reciba la conexión
+                if db_manager.conn.in_transaction:
+                    db_manager.rollback()
+                db_manager.batch_depth = 0
+                self.idle.put(db_manager)
+
+    def close(self):
+        while True:
+            try:
+                self.idle.get_nowait().conn.close()
+            except queue.Empty:
+                return
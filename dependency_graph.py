@@ -0,0 +1,84 @@
+# dependency_graph.py
+import heapq
+from collections import defaultdict
+
+
+class DependencyCycleError(ValueError):
+    pass
+
+
+class DependencyGraph:
+    """Grafo de dependencias entre módulos Odoo construido a partir de 'depends'."""
+
+    def __init__(self, depends):
+        self.depends = defaultdict(set)
+        self.reverse = defaultdict(set)
+        for module_name, module_depends in depends.items():
+            self.depends[module_name].update(module_depends)
+            for depend in module_depends:
+                self.reverse[depend].add(module_name)
+        self.closure_cache = {}
+        self.reverse_closure_cache = {}
+
+    @classmethod
+    def from_database(cls, db_manager, path_id=None):
+        depends = {module_name: set() for module_name, _ in db_manager.get_odoo_modules()}
+        for _, module_name, depends_on in db_manager.get_module_depends(path_id):
+            depends.setdefault(module_name, set()).add(depends_on)
+        return cls(depends)
+
+    def modules(self):
+        return set(self.depends) | set(self.reverse)
+
+    def transitive_dependencies(self, module_name):
+        return self.closure(module_name, self.depends, self.closure_cache)
+
+    def transitive_dependents(self, module_name):
+        return self.closure(module_name, self.reverse, self.reverse_closure_cache)
+
+    def closure(self, module_name, edges, cache):
+        if module_name in cache:
+            return cache[module_name]
+        seen = set()
+        stack = list(edges.get(module_name, ()))
+        while stack:
+            current = stack.pop()
+            if current in seen or current == module_name:
+                continue
+            seen.add(current)
+            if current in cache:
+                seen.update(cache[current])
+            else:
+                stack.extend(edges.get(current, ()))
+        cache[module_name] = frozenset(seen)
+        return cache[module_name]
+
+    def affected_modules(self, changed_modules):
+        affected = set(changed_modules)
+        for module_name in changed_modules:
+            affected.update(self.transitive_dependents(module_name))
+        return affected
+
+    def topological_order(self, modules=None):
+        """Ordena los módulos de forma que cada uno vaya después de sus dependencias.
+
+        Si se pasa un subconjunto, las dependencias fuera de él se consideran ya instaladas.
+        Entre módulos listos a la vez se sigue el orden alfabético.
+        """
+        modules = self.modules() if modules is None else set(modules)
+        remaining = {module_name: len(self.depends.get(module_name, set()) & modules) for module_name in modules}
+        ready = [module_name for module_name, count in remaining.items() if not count]
+        heapq.heapify(ready)
+        order = []
+        while ready:
+            module_name = heapq.heappop(ready)
+            order.append(module_name)
+            for dependent in self.reverse.get(module_name, ()):
+                if dependent in remaining:
+                    remaining[dependent] -= 1
+                    if not remaining[dependent]:
+                        heapq.heappush(ready, dependent)
+        if len(order) < len(modules):
+            cyclic = sorted(module_name for module_name, count in remaining.items() if count)
+            raise DependencyCycleError(f"Dependencias cíclicas entre: {', '.join(cyclic)}")
+        return order
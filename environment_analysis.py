@@ -3,11 +3,27 @@ import platform
 import psutil
 import json
 from PyQt6.QtCore import QThread, pyqtSignal
+from scoring import ScoringEngine, SCORE_COMPONENTS
+
+scoring_engine = ScoringEngine()
+
+def score_environment(metrics, workload=None):
+    """Puntúa las métricas con la carga real y guarda el resultado y su desglose en ellas."""
+    result = scoring_engine.score(metrics, workload)
+    metrics['optimization'] = result['score']
+    for component in SCORE_COMPONENTS:
+        metrics[f'score_{component}'] = result['components'].get(component)
+    return result
 
 class EnvironmentAnalysisThread(QThread):
     progress_update = pyqtSignal(int)
     result_ready = pyqtSignal(str)
 
+    def __init__(self, workload=None):
+        super().__init__()
+        # workload: {'module_count': ..., 'workers': ...} de la instalación de Odoo
+        self.workload = workload or {}
+
     def run(self):
         result = {}
         
@@ -24,53 +40,55 @@ class EnvironmentAnalysisThread(QThread):
         # Análisis de CPU
         self.progress_update.emit(30)
         cpu_freq = psutil.cpu_freq()
-        result['cpu'] = {
-            "physical_cores": psutil.cpu_count(logical=False),
-            "total_cores": psutil.cpu_count(logical=True),
-            "max_frequency": f"{cpu_freq.max:.2f}Mhz",
-            "min_frequency": f"{cpu_freq.min:.2f}Mhz",
-            "current_frequency": f"{cpu_freq.current:.2f}Mhz",
-            "usage_per_core": [f"{percentage:.1f}%" for percentage in psutil.cpu_percent(percpu=True, interval=1)]
+        cpu_times = psutil.cpu_times_percent(percpu=True, interval=1)
+        cpu_usage = [100.0 - times.idle for times in cpu_times]
+        result['usage_per_core'] = cpu_usage
+        metrics = {
+            "cpu_cores": psutil.cpu_count(logical=True),
+            "cpu_physical_cores": psutil.cpu_count(logical=False),
+            "cpu_max_frequency_mhz": cpu_freq.max,
+            "cpu_current_frequency_mhz": cpu_freq.current,
+            "cpu_usage_percent": sum(cpu_usage) / len(cpu_usage) if cpu_usage else 0.0,
+            # iowait solo existe en Linux: en el resto queda a None y no puntúa
+            "cpu_iowait_percent": (sum(times.iowait for times in cpu_times) / len(cpu_times)
+                                   if cpu_times and hasattr(cpu_times[0], 'iowait') else None),
         }
         
         # Análisis de memoria
         self.progress_update.emit(50)
         mem = psutil.virtual_memory()
-        result['memory'] = {
-            "total": f"{mem.total / (1024**3):.2f} GB",
-            "available": f"{mem.available / (1024**3):.2f} GB",
-            "used": f"{mem.used / (1024**3):.2f} GB",
-            "percentage": f"{mem.percent}%"
-        }
+        metrics.update({
+            "memory_total_gb": mem.total / (1024**3),
+            "memory_available_gb": mem.available / (1024**3),
+            "memory_used_gb": mem.used / (1024**3),
+            "memory_percent": mem.percent,
+            "swap_percent": psutil.swap_memory().percent,
+        })
         
         # Análisis de disco
         self.progress_update.emit(70)
         disk = psutil.disk_usage('/')
-        result['disk'] = {
-            "total": f"{disk.total / (1024**3):.2f} GB",
-            "used": f"{disk.used / (1024**3):.2f} GB",
-            "free": f"{disk.free / (1024**3):.2f} GB",
-            "percentage": f"{disk.percent}%"
-        }
+        metrics.update({
+            "disk_total_gb": disk.total / (1024**3),
+            "disk_used_gb": disk.used / (1024**3),
+            "disk_free_gb": disk.free / (1024**3),
+            "disk_percent": disk.percent,
+        })
         
         # Análisis de red
         self.progress_update.emit(90)
         net_io = psutil.net_io_counters()
-        result['network'] = {
-            "bytes_sent": f"{net_io.bytes_sent / (1024**2):.2f} MB",
-            "bytes_recv": f"{net_io.bytes_recv / (1024**2):.2f} MB",
-            "packets_sent": net_io.packets_sent,
-            "packets_recv": net_io.packets_recv
-        }
+        metrics.update({
+            "net_bytes_sent": net_io.bytes_sent,
+            "net_bytes_recv": net_io.bytes_recv,
+            "net_packets_sent": net_io.packets_sent,
+            "net_packets_recv": net_io.packets_recv,
+        })
         
         self.progress_update.emit(100)
         
-        # Evaluación de optimización
-        cpu_optimal = result['cpu']['total_cores'] >= 4 and float(result['cpu']['max_frequency'][:-3]) > 2000
-        memory_optimal = float(result['memory']['total'][:-3]) >= 8
-        disk_optimal = float(result['disk']['total'][:-3]) >= 100 and float(result['disk']['percentage'][:-1]) < 80
-        
-        optimization_score = (cpu_optimal + memory_optimal + disk_optimal) / 3 * 100
-        result['optimization'] = f"{optimization_score:.1f}%"
+        result['bottleneck'] = score_environment(metrics, self.workload)['bottleneck']
+        # Solo números: el formato para mostrar se aplica en la interfaz
+        result['metrics'] = metrics
         
-        self.result_ready.emit(json.dumps(result, indent=2))
+        self.result_ready.emit(json.dumps(result))
@@ -0,0 +1,190 @@
+# environment_monitor.py
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+import psutil
+from PyQt6.QtCore import QThread
+from database_manager import DatabaseManager
+from environment_analysis import score_environment
+
+DEFAULT_PROCESS_NAMES = ('odoo-bin', 'postgres')
+
+
+class MetricsSampler:
+    """Toma muestras del sistema sin bloquear: CPU, disco y red se miden como
+    diferencia respecto a la muestra anterior en lugar de esperar un intervalo."""
+
+    def __init__(self, process_names=DEFAULT_PROCESS_NAMES, process_refresh_seconds=60, workload=None):
+        self.workload = workload or {}
+        self.process_names = tuple(name.lower() for name in process_names)
+        self.process_refresh_seconds = process_refresh_seconds
+        self.processes = {}
+        self.processes_refreshed = 0
+        # La primera llamada solo fija la referencia de los contadores
+        psutil.cpu_times_percent(interval=None)
+        self.last_time = time.monotonic()
+        self.last_disk = psutil.disk_io_counters(perdisk=True) or {}
+        self.last_net = psutil.net_io_counters(pernic=True)
+
+    def sample(self):
+        now = time.monotonic()
+        elapsed = max(now - self.last_time, 1e-6)
+        self.last_time = now
+
+        cpu_times = psutil.cpu_times_percent(interval=None)
+        cpu_freq = psutil.cpu_freq()
+        mem = psutil.virtual_memory()
+        swap = psutil.swap_memory()
+        disk = psutil.disk_usage('/')
+        net_io = psutil.net_io_counters()
+        metrics = {
+            "cpu_cores": psutil.cpu_count(logical=True),
+            "cpu_physical_cores": psutil.cpu_count(logical=False),
+            "cpu_max_frequency_mhz": cpu_freq.max if cpu_freq else 0.0,
+            "cpu_current_frequency_mhz": cpu_freq.current if cpu_freq else 0.0,
+            "cpu_usage_percent": 100.0 - cpu_times.idle,
+            "cpu_iowait_percent": getattr(cpu_times, 'iowait', None),
+            "memory_total_gb": mem.total / (1024**3),
+            "memory_available_gb": mem.available / (1024**3),
+            "memory_used_gb": mem.used / (1024**3),
+            "memory_percent": mem.percent,
+            "swap_percent": swap.percent,
+            "disk_total_gb": disk.total / (1024**3),
+            "disk_used_gb": disk.used / (1024**3),
+            "disk_free_gb": disk.free / (1024**3),
+            "disk_percent": disk.percent,
+            "net_bytes_sent": net_io.bytes_sent,
+            "net_bytes_recv": net_io.bytes_recv,
+            "net_packets_sent": net_io.packets_sent,
+            "net_packets_recv": net_io.packets_recv,
+        }
+        score_environment(metrics, self.workload)
+
+        resources = self.sample_disks(elapsed) + self.sample_nics(elapsed) + self.sample_processes()
+        return time.time(), metrics, resources
+
+    def sample_disks(self, elapsed):
+        counters = psutil.disk_io_counters(perdisk=True) or {}
+        rows = []
+        for name, current in counters.items():
+            previous = self.last_disk.get(name)
+            if previous:
+                rows.append(('disk', name, None, None,
+                             (current.read_bytes - previous.read_bytes) / elapsed,
+                             (current.write_bytes - previous.write_bytes) / elapsed))
+        self.last_disk = counters
+        return rows
+
+    def sample_nics(self, elapsed):
+        counters = psutil.net_io_counters(pernic=True)
+        rows = []
+        for name, current in counters.items():
+            previous = self.last_net.get(name)
+            if previous:
+                rows.append(('nic', name, None, None,
+                             (current.bytes_recv - previous.bytes_recv) / elapsed,
+                             (current.bytes_sent - previous.bytes_sent) / elapsed))
+        self.last_net = counters
+        return rows
+
+    def sample_processes(self):
+        # Recorrer todos los procesos es lo más caro; se hace solo cada process_refresh_seconds
+        if time.monotonic() - self.processes_refreshed > self.process_refresh_seconds:
+            self.refresh_processes()
+        totals = {}
+        for pid, (name, process) in list(self.processes.items()):
+            try:
+                with process.oneshot():
+                    cpu = process.cpu_percent(interval=None)
+                    rss = process.memory_info().rss
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                del self.processes[pid]
+                continue
+            total = totals.setdefault(name, [0.0, 0.0])
+            total[0] += cpu
+            total[1] += rss / (1024**2)
+        return [('process', name, cpu, memory_mb, None, None) for name, (cpu, memory_mb) in totals.items()]
+
+    def refresh_processes(self):
+        self.processes_refreshed = time.monotonic()
+        for process in psutil.process_iter(['name', 'cmdline']):
+            if process.pid in self.processes:
+                continue
+            name = self.match_process(process.info['name'], process.info['cmdline'])
+            if name:
+                try:
+                    process.cpu_percent(interval=None)
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+                self.processes[process.pid] = (name, process)
+
+    def match_process(self, process_name, cmdline):
+        candidates = [process_name or ''] + [os.path.basename(arg) for arg in (cmdline or [])[:2]]
+        for candidate in candidates:
+            candidate = candidate.lower()
+            for name in self.process_names:
+                if candidate.startswith(name):
+                    return name
+        return None
+
+
+class EnvironmentMonitorThread(QThread):
+    def __init__(self, db_name, interval=5.0, flush_every=12, buffer_size=720, process_names=DEFAULT_PROCESS_NAMES,
+                 workers=None):
+        super().__init__()
+        self.workers = workers
+        self.db_name = db_name
+        self.interval = interval
+        self.flush_every = flush_every
+        self.process_names = process_names
+        # Búfer circular: si la base de datos no responde se pierden las muestras más antiguas
+        self.buffer = deque(maxlen=buffer_size)
+        self.stop_event = threading.Event()
+        self.samples_taken = 0
+        self.last_sample = None
+        self.last_error = None
+
+    def stop(self):
+        self.stop_event.set()
+        self.wait()
+
+    def run(self):
+        db_manager = DatabaseManager(self.db_name)
+        sampler = MetricsSampler(self.process_names)
+        sampler.workload = self.workload(db_manager)
+        try:
+            while not self.stop_event.wait(self.interval):
+                sample = sampler.sample()
+                self.buffer.append(sample)
+                self.samples_taken += 1
+                self.last_sample = sample
+                if len(self.buffer) >= self.flush_every and self.flush(db_manager):
+                    sampler.workload = self.workload(db_manager)
+        finally:
+            self.flush(db_manager)
+            db_manager.conn.close()
+
+    def workload(self, db_manager):
+        return {"module_count": db_manager.get_module_stats()['module_count'], "workers": self.workers}
+
+    def flush(self, db_manager):
+        # Las muestras salen del búfer solo cuando la escritura se ha confirmado; si la base de datos
+        # falla se reintenta en el siguiente volcado y el búfer circular acota lo que se acumula
+        samples = list(self.buffer)
+        if not samples:
+            return True
+        try:
+            with db_manager.batch():
+                db_manager.save_environment_metrics_batch([(timestamp, metrics) for timestamp, metrics, _ in samples])
+                db_manager.save_resource_samples([(timestamp,) + row for timestamp, _, resources in samples for row in resources])
+        except sqlite3.Error as e:
+            # Un commit fallido deja la transacción abierta: se descarta para no duplicar filas al reintentar
+            db_manager.rollback()
+            self.last_error = f"{type(e).__name__}: {e}"
+            return False
+        for _ in samples:
+            self.buffer.popleft()
+        self.last_error = None
+        return True
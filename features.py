@@ -0,0 +1,69 @@
+# features.py
+import numpy as np
+
+# Orden fijo de las columnas de entrada del modelo Mahoraga
+ENVIRONMENT_FEATURES = [
+    'cpu_cores',
+    'cpu_max_frequency_mhz',
+    'cpu_usage_percent',
+    'memory_total_gb',
+    'memory_percent',
+    'disk_total_gb',
+    'disk_percent',
+]
+MODULE_FEATURES = [
+    'module_count',
+    'tested_module_count',
+    'module_file_count',
+]
+FEATURE_SCHEMA = ENVIRONMENT_FEATURES + MODULE_FEATURES
+
+
+def build_feature_matrix(environment_rows, module_stats):
+    """Construye la matriz (N, len(FEATURE_SCHEMA)) a partir de N filas de métricas.
+
+    Cada fila trae los valores de ENVIRONMENT_FEATURES en ese orden; module_stats
+    es un dict con las claves de MODULE_FEATURES y se repite en cada fila.
+    """
+    X = np.empty((len(environment_rows), len(FEATURE_SCHEMA)), dtype=np.float32)
+    X[:, :len(ENVIRONMENT_FEATURES)] = environment_rows
+    X[:, len(ENVIRONMENT_FEATURES):] = [module_stats[name] for name in MODULE_FEATURES]
+    return X
+
+
+def environment_row(metrics):
+    return [metrics[name] for name in ENVIRONMENT_FEATURES]
+
+
+class FeatureNormalizer:
+    """Estandariza columnas con la media y desviación del conjunto de entrenamiento."""
+
+    def __init__(self, mean=None, std=None, constant=None):
+        self.mean = None if mean is None else np.asarray(mean, dtype=np.float32)
+        self.std = None if std is None else np.asarray(std, dtype=np.float32)
+        self.constant = None if constant is None else np.asarray(constant, dtype=bool)
+        self.scale = None
+        if self.std is not None:
+            # Una columna que no varió en el entrenamiento (p. ej. un solo equipo) siempre vale 0:
+            # el modelo nunca aprendió qué hacer con otro valor
+            constant = np.zeros(len(self.std), dtype=bool) if self.constant is None else self.constant
+            self.scale = np.where(constant, 0.0, 1.0 / self.std).astype(np.float32)
+
+    def fit(self, X):
+        std = X.std(axis=0)
+        self.__init__(X.mean(axis=0), np.where(std > 1e-6, std, 1.0), std <= 1e-6)
+        return self
+
+    def transform(self, X):
+        if self.mean is None:
+            return X
+        return (X - self.mean) * self.scale
+
+    def to_dict(self):
+        if self.mean is None:
+            return {}
+        return {"mean": self.mean.tolist(), "std": self.std.tolist(), "constant": self.constant.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data.get('mean'), data.get('std'), data.get('constant'))
@@ -0,0 +1,170 @@
+# instrumentation.py
+import io
+import sys
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+PROFILE_TOP = 25
+TRACEMALLOC_FRAMES = 10
+# Desde 3.12 cProfile usa sys.monitoring: un solo perfilador ve todos los hilos y no admite un segundo
+PER_THREAD_PROFILERS = sys.version_info < (3, 12)
+
+
+class Instrumentation:
+    """Tramos de tiempo y contadores acumulados en memoria, por proceso.
+
+    Registrar un tramo cuesta un perf_counter y un lock; lo acumulado se vuelca a la
+    base de datos con flush_metrics cuando termina un trabajo, no en cada llamada.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.counters = {}
+        self.session = time.time()
+        self.capture = None
+
+    @contextmanager
+    def span(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name, seconds, calls=1, peak=None):
+        peak = seconds if peak is None else peak
+        with self.lock:
+            entry = self.spans.get(name)
+            if entry is None:
+                self.spans[name] = [calls, seconds, peak]
+            else:
+                entry[0] += calls
+                entry[1] += seconds
+                entry[2] = max(entry[2], peak)
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def drain(self):
+        """Devuelve lo acumulado desde el último vaciado y empieza de cero."""
+        with self.lock:
+            data = {"spans": self.spans, "counters": self.counters}
+            self.spans, self.counters = {}, {}
+        return data
+
+    def merge(self, data):
+        # Lo medido en los procesos del pool llega con el resultado de cada módulo
+        for name, (calls, seconds, peak) in data.get('spans', {}).items():
+            self.record(name, seconds, calls, peak)
+        for name, value in data.get('counters', {}).items():
+            self.count(name, value)
+
+    def start_capture(self, label):
+        if self.capture is not None:
+            return False
+        self.capture = ProfileCapture(label)
+        return True
+
+    def stop_capture(self):
+        capture, self.capture = self.capture, None
+        return capture.stop() if capture else None
+
+
+class ProfileCapture:
+    """cProfile del hilo que la inicia y de los hilos marcados con profiled(), más tracemalloc del proceso.
+
+    Antes de 3.12 cProfile solo ve el hilo en el que se activa: cada hilo de trabajo usa
+    su propio perfilador y las estadísticas se suman al detener la captura. Los procesos
+    del pool de análisis no se perfilan; sus tramos sí llegan a los contadores.
+    """
+
+    def __init__(self, label):
+        self.label = label
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.profilers = []
+        self.owner = threading.get_ident()
+        self.tracing_memory = not tracemalloc.is_tracing()
+        if self.tracing_memory:
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self.profiler = cProfile.Profile()
+        self.profiler.enable()
+
+    @contextmanager
+    def thread(self):
+        # En modo sin interfaz todo corre en el hilo que ya se está perfilando
+        profiler = None
+        if PER_THREAD_PROFILERS and threading.get_ident() != self.owner:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Otra herramienta de perfilado ocupa el intérprete: el hilo sigue sin perfilar
+                profiler = None
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                with self.lock:
+                    self.profilers.append(profiler)
+
+    def stop(self):
+        self.profiler.disable()
+        peak_memory = 0
+        allocations = []
+        if self.tracing_memory:
+            peak_memory = tracemalloc.get_traced_memory()[1]
+            allocations = tracemalloc.take_snapshot().statistics('lineno')[:PROFILE_TOP]
+            tracemalloc.stop()
+
+        output = io.StringIO()
+        stats = pstats.Stats(self.profiler, stream=output)
+        with self.lock:
+            for profiler in self.profilers:
+                stats.add(profiler)
+        stats.sort_stats('cumulative').print_stats(PROFILE_TOP)
+        functions = output.getvalue().strip()
+        return {
+            "label": self.label,
+            "started": self.started,
+            "duration": time.time() - self.started,
+            "peak_memory": peak_memory,
+            "report": (f"Funciones por tiempo acumulado ({len(self.profilers) + 1} perfiladores):\n{functions}\n\n"
+                       "Memoria asignada por línea:\n" + "\n".join(str(stat) for stat in allocations)),
+        }
+
+
+instrumentation = Instrumentation()
+
+
+def span(name):
+    return instrumentation.span(name)
+
+
+def count(name, value=1):
+    instrumentation.count(name, value)
+
+
+@contextmanager
+def profiled():
+    """Perfila el hilo actual si hay una captura en curso; si no, no hace nada."""
+    capture = instrumentation.capture
+    if capture is None:
+        yield
+        return
+    with capture.thread():
+        yield
+
+
+def flush_metrics(db_manager):
+    data = instrumentation.drain()
+    if data['spans'] or data['counters']:
+        db_manager.save_performance_metrics(instrumentation.session, data)
+    return data
@@ -0,0 +1,129 @@
+# job_manager.py
+import itertools
+from collections import deque
+from PyQt6.QtCore import QObject, pyqtSignal
+
+QUEUED, RUNNING, FINISHED, CANCELLED = 'en cola', 'en curso', 'terminado', 'cancelado'
+
+
+class Job(QObject):
+    """Un hilo de análisis o de pruebas gestionado por el JobManager.
+
+    Vive en el hilo de la interfaz: las señales del hilo de trabajo le llegan en cola.
+    """
+
+    def __init__(self, manager, job_id, kind, name, thread):
+        super().__init__()
+        self.manager = manager
+        self.id = job_id
+        self.kind = kind
+        self.name = name
+        self.thread = thread
+        self.status = QUEUED
+        self.progress = 0
+        self.message = ""
+        self.result = ""
+        thread.progress_update.connect(self.update_progress)
+        thread.result_ready.connect(self.set_result)
+        thread.finished.connect(self.finish)
+
+    def update_progress(self, value, message):
+        self.progress = value
+        self.message = message
+        self.manager.job_updated(self)
+
+    def set_result(self, result):
+        self.result = result
+
+    def finish(self):
+        if self.status != CANCELLED:
+            self.status = FINISHED
+        self.progress = 100
+        self.manager.job_done(self)
+
+    def cancel(self):
+        if self.status == QUEUED:
+            self.status = CANCELLED
+            self.result = f"Trabajo cancelado antes de empezar: {self.name}"
+            self.finish()
+        elif self.status == RUNNING:
+            self.status = CANCELLED
+            self.thread.cancel()
+
+
+class JobManager(QObject):
+    """Cola de análisis y pruebas con un límite global de trabajos simultáneos.
+
+    El progreso agregado es la media de todos los trabajos de la tanda actual;
+    la tanda se reinicia cuando la cola se vacía.
+    """
+    progress_changed = pyqtSignal(int, str)
+    job_finished = pyqtSignal(str, str)
+    # Se emite cuando termina el último trabajo de un tipo (p. ej. todos los análisis)
+    kind_finished = pyqtSignal(str)
+    idle = pyqtSignal()
+
+    def __init__(self, max_jobs=2):
+        super().__init__()
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self.queue = deque()
+        self.running = set()
+        self.ids = itertools.count(1)
+
+    def submit(self, kind, name, thread):
+        if not self.queue and not self.running:
+            self.jobs = {}
+        job = Job(self, next(self.ids), kind, name, thread)
+        self.jobs[job.id] = job
+        self.queue.append(job)
+        self.start_next()
+        return job.id
+
+    def start_next(self):
+        while self.queue and len(self.running) < self.max_jobs:
+            job = self.queue.popleft()
+            job.status = RUNNING
+            self.running.add(job.id)
+            job.thread.start()
+
+    def job_updated(self, job):
+        self.progress_changed.emit(self.progress(), f"[{job.name}] {job.message}")
+
+    def job_done(self, job):
+        if job in self.queue:
+            self.queue.remove(job)
+        self.running.discard(job.id)
+        self.job_finished.emit(job.kind, job.result)
+        self.start_next()
+        if not any(other.kind == job.kind for other in self.pending()):
+            self.kind_finished.emit(job.kind)
+        if not self.queue and not self.running:
+            self.idle.emit()
+        else:
+            self.job_updated(job)
+
+    def pending(self):
+        # Un trabajo cancelado sigue pendiente hasta que su hilo termina de verdad
+        return list(self.queue) + [self.jobs[job_id] for job_id in self.running]
+
+    def progress(self):
+        return int(sum(job.progress for job in self.jobs.values()) / len(self.jobs)) if self.jobs else 100
+
+    def cancel(self, job_id=None, kind=None):
+        """Cancela un trabajo por id, todos los de un tipo o, sin argumentos, todos."""
+        jobs = [job for job in self.pending() if job.status != CANCELLED
+                and (job_id is None or job.id == job_id) and (kind is None or job.kind == kind)]
+        for job in jobs:
+            job.cancel()
+        return len(jobs)
+
+    def wait(self):
+        for job in list(self.jobs.values()):
+            job.thread.wait()
+
+    def results(self, kind):
+        return [job.result for job in self.jobs.values() if job.kind == kind and job.result]
+
+    def describe(self):
+        return [f"#{job.id} {job.kind} {job.name}: {job.status} ({job.progress}%)" for job in self.jobs.values()]
@@ -1,50 +1,185 @@
 # mahoraga.py
 
+import os
+import json
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from database_manager import ConnectionPool
+from instrumentation import span, profiled
+from features import FEATURE_SCHEMA, FeatureNormalizer, build_feature_matrix, environment_row
 from odoo_analysis import OdooAnalysisThread
-import tensorflow as tf
+
+# Cambiar cuando cambie la arquitectura o las características de entrada;
+# los pesos guardados con otra versión se descartan
+MODEL_SCHEMA_VERSION = 4
+TRAINING_EPOCHS = 20
+
+# Activaciones soportadas por el paso hacia delante en NumPy
+ACTIVATIONS = {
+    'relu': lambda x: np.maximum(x, 0),
+    'linear': lambda x: x,
+}
+
 class Mahoraga:
     def __init__(self, db_manager):
         self.db_manager = db_manager
-        self.model = self.create_model()
+        # TensorFlow se importa y el modelo se construye en segundo plano, al primer uso
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.model_future = None
+        model_dir = os.path.dirname(os.path.abspath(db_manager.db_name))
+        self.weights_path = os.path.join(model_dir, 'mahoraga_model.weights.h5')
+        self.metadata_path = os.path.join(model_dir, 'mahoraga_model.json')
+        self.metadata = {}
+        self.checkpoint_error = None
+        # (versión, normalizador, capas densas en NumPy) se publican en una sola asignación:
+        # predecir una fila no necesita el bucle de Keras ni puede mezclar dos versiones
+        self.published = (0, FeatureNormalizer(), None)
+        self.last_prediction = None
+
+    @property
+    def model(self):
+        return self.preload().result()
+
+    def preload(self):
+        if self.model_future is None:
+            self.model_future = self.executor.submit(self.create_model)
+        return self.model_future
+
+    def is_ready(self):
+        return self.model_future is not None and self.model_future.done() and self.model_future.exception() is None
+
+    def load_error(self):
+        # Si la carga falló (p. ej. sin TensorFlow) el futuro queda terminado con la excepción
+        if self.model_future is not None and self.model_future.done():
+            return self.model_future.exception()
+        return None
 
     def create_model(self):
+        with span('mahoraga.load_model'):
+            return self.build_model()
+
+    def build_model(self):
+        model = self.new_model()
+        try:
+            normalizer = self.load_checkpoint(model)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            # Checkpoint ilegible o incompatible: se descarta y se empieza con pesos nuevos
+            self.checkpoint_error = f"{type(e).__name__}: {e}"
+            self.metadata = {}
+            model = self.new_model()
+            normalizer = FeatureNormalizer()
+        self.export_dense_layers(model, normalizer)
+        return model
+
+    def new_model(self):
+        import tensorflow as tf
         model = tf.keras.Sequential([
-            tf.keras.layers.Dense(64, activation='relu', input_shape=(10,)),
+            tf.keras.layers.Dense(64, activation='relu', input_shape=(len(FEATURE_SCHEMA),)),
             tf.keras.layers.Dense(32, activation='relu'),
             tf.keras.layers.Dense(1)
         ])
         model.compile(optimizer='adam', loss='mean_squared_error')
         return model
 
-    def learn_odoo_structure(self, odoo_path):
+    def export_dense_layers(self, model, normalizer):
+        layers = []
+        for layer in model.layers:
+            activation = layer.get_config().get('activation')
+            if activation not in ACTIVATIONS:
+                layers = None
+                break
+            weights, bias = layer.get_weights()
+            layers.append((weights, bias, ACTIVATIONS[activation]))
+        self.publish(normalizer, layers)
+
+    def publish(self, normalizer, layers):
+        self.published = (self.published[0] + 1, normalizer, layers)
+
+    def load_checkpoint(self, model):
+        if not os.path.exists(self.metadata_path) or not os.path.exists(self.weights_path):
+            return FeatureNormalizer()
+        with open(self.metadata_path, 'r', encoding='utf-8') as f:
+            metadata = json.load(f)
+        if metadata.get('schema_version') != MODEL_SCHEMA_VERSION or metadata.get('features') != FEATURE_SCHEMA:
+            return FeatureNormalizer()
+        model.load_weights(self.weights_path)
+        normalizer = FeatureNormalizer.from_dict(metadata.get('normalization', {}))
+        self.metadata = metadata
+        return normalizer
+
+    def save_checkpoint(self, model, samples, normalizer):
+        model.save_weights(self.weights_path)
+        self.metadata = {
+            "schema_version": MODEL_SCHEMA_VERSION,
+            "features": FEATURE_SCHEMA,
+            "normalization": normalizer.to_dict(),
+            "version": self.metadata.get('version', 0) + 1,
+            "samples": samples,
+            "trained_at": time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        # Se escribe a un temporal para no dejar metadatos a medias si se corta
+        tmp_path = self.metadata_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, indent=2)
+        os.replace(tmp_path, self.metadata_path)
+
+    def learn_odoo_structure(self, odoo_path, incremental=True, max_workers=None, include=None, exclude=None,
+                             use_test_cache=True):
         path_id = self.db_manager.save_odoo_path(odoo_path)
-        return OdooAnalysisThread(odoo_path, path_id)
-
-    def train_model(self, environment_data, odoo_data):
-        X = self.preprocess_data(environment_data, odoo_data)
-        y = np.array([float(environment_data['optimization'][:-1])])
-        self.model.fit(X, y, epochs=100, verbose=0)
-
-    def predict_optimization(self, environment_data, odoo_data):
-        X = self.preprocess_data(environment_data, odoo_data)
-        return self.model.predict(X)[0][0]
-
-    def preprocess_data(self, environment_data, odoo_data):
-        cpu_cores = environment_data['cpu']['total_cores']
-        cpu_freq = float(environment_data['cpu']['max_frequency'][:-3])
-        memory_total = float(environment_data['memory']['total'][:-3])
-        disk_total = float(environment_data['disk']['total'][:-3])
-        disk_used_percent = float(environment_data['disk']['percentage'][:-1])
-        num_modules = len(odoo_data)
-
-        X = np.array([
-            cpu_cores / 16,
-            cpu_freq / 5000,
-            memory_total / 64,
-            disk_total / 1000,
-            disk_used_percent / 100,
-            num_modules / 100
-        ])
+        previous_manifests = self.db_manager.get_module_manifests(path_id) if incremental else None
+        return OdooAnalysisThread(odoo_path, path_id, self.db_manager.db_name, previous_manifests, incremental, max_workers,
+                                  include, exclude, use_test_cache)
+
+    def train_model(self):
+        # Se encola detrás de la carga del modelo, en el mismo hilo de fondo
+        self.preload()
+        return self.executor.submit(self.train_on_history)
+
+    def train_on_history(self):
+        with profiled(), span('mahoraga.train'):
+            return self.fit_history()
+
+    def fit_history(self):
+        model = self.model
+        # Conexión del pool: la del DatabaseManager principal pertenece al hilo de la interfaz
+        with ConnectionPool.for_database(self.db_manager.db_name).connection() as db_manager:
+            # Solo filas puntuadas por el motor de puntuación continuo (con desglose por recurso) y
+            # con el número de módulos de su momento; las anteriores repetirían el actual en todas
+            history = db_manager.get_environment_metrics(
+                FEATURE_SCHEMA + ['optimization'], require=FEATURE_SCHEMA + ['optimization', 'score_cpu'])
+        if not history:
+            return None
+
+        # Filas (timestamp, *características, optimización): las columnas ya siguen FEATURE_SCHEMA
+        history = np.asarray(history, dtype=np.float32)
+        X = history[:, 1:-1]
+        y = history[:, -1]
+        # Las estadísticas de normalización se recalculan con todo el historial y se guardan con los pesos
+        normalizer = FeatureNormalizer().fit(X)
+        # Arranque en caliente: los pesos cargados del último checkpoint se siguen ajustando
+        model.fit(normalizer.transform(X), y, epochs=TRAINING_EPOCHS, batch_size=32, verbose=0)
+        self.save_checkpoint(model, len(history), normalizer)
+        self.export_dense_layers(model, normalizer)
+        return self.metadata
+
+    def predict_optimization(self, environment_metrics, module_stats):
+        weights_version, normalizer, dense_layers = self.published
+        X = normalizer.transform(build_feature_matrix([environment_row(environment_metrics)], module_stats))
+        # Se reutiliza la última predicción mientras no cambien los datos ni los pesos
+        key = (weights_version, X.tobytes())
+        if self.last_prediction and self.last_prediction[0] == key:
+            return self.last_prediction[1]
+
+        if dense_layers is None:
+            prediction = float(self.model(X, training=False).numpy()[0][0])
+        else:
+            for weights, bias, activation in dense_layers:
+                X = activation(X @ weights + bias)
+            prediction = float(X[0][0])
+        self.last_prediction = (key, prediction)
+        return prediction
 
-        return X.reshape(1, -1)
\ No newline at end of file
+    def preprocess_data(self, environment_metrics, module_stats):
+        rows = [environment_row(metrics) for metrics in environment_metrics]
+        return self.published[1].transform(build_feature_matrix(rows, module_stats))
\ No newline at end of file
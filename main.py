@@ -1,19 +1,33 @@
 # main.py
 import sys
 
-from PyQt6.QtWidgets import QApplication
-from utils import check_and_install_dependencies, is_venv, create_virtual_env, run_in_virtual_env
-from zegion import Zegion
+from utils import StartupTimer
+
+startup_timer = StartupTimer()
+
+
+def window_visible():
+    startup_timer.mark("ventana visible")
+    print(startup_timer.report())
 
 
 if __name__ == '__main__':
+    # Dentro del bloque: los workers del análisis (spawn) vuelven a importar este módulo y no
+    # deben cargar la interfaz, Qt ni la voz
+    from PyQt6.QtWidgets import QApplication
+    from PyQt6.QtCore import QTimer
+    from utils import check_and_install_dependencies, is_venv, create_virtual_env, run_in_virtual_env
+    from zegion import Zegion
+
     if not is_venv():
         create_virtual_env()
         run_in_virtual_env()
 
     check_and_install_dependencies()
+    startup_timer.mark("dependencias verificadas")
 
     app = QApplication(sys.argv)
-    zegion = Zegion()
+    zegion = Zegion(startup_timer)
     zegion.show()
+    QTimer.singleShot(0, window_visible)
     sys.exit(app.exec())
\ No newline at end of file
@@ -0,0 +1,301 @@
+# migrations.py
+# Cada migración se aplica una sola vez; la versión aplicada se guarda en PRAGMA user_version.
+import json
+import zlib
+from module_manifest import decode_source
+
+
+def create_base_tables(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS commands_history
+        (id INTEGER PRIMARY KEY, command TEXT, response TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS environment_analysis
+        (id INTEGER PRIMARY KEY, analysis_data TEXT, timestamp DATETIME DEFAULT CURRENT_TIMESTAMP)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS odoo_paths
+        (id INTEGER PRIMARY KEY, path TEXT UNIQUE)
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS odoo_modules
+        (id INTEGER PRIMARY KEY, module_name TEXT, module_path TEXT, code_content TEXT,
+         test_content TEXT, test_result TEXT, version TEXT, path_id INTEGER,
+         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+         FOREIGN KEY(path_id) REFERENCES odoo_paths(id))
+    ''')
+
+
+def add_legacy_module_columns(cursor):
+    # Bases creadas antes de que odoo_modules guardara código, tests y versión
+    cursor.execute("PRAGMA table_info(odoo_modules)")
+    columns = [row[1] for row in cursor.fetchall()]
+    for column in ['code_content', 'test_content', 'test_result', 'version', 'path_id']:
+        if column not in columns:
+            cursor.execute(f"ALTER TABLE odoo_modules ADD COLUMN {column} TEXT")
+
+
+def create_module_files(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS odoo_module_files
+        (id INTEGER PRIMARY KEY, path_id INTEGER, module_name TEXT, file_path TEXT,
+         mtime REAL, size INTEGER, hash TEXT,
+         UNIQUE(path_id, module_name, file_path),
+         FOREIGN KEY(path_id) REFERENCES odoo_paths(id))
+    ''')
+
+
+def unique_odoo_modules(cursor):
+    # Reconstruye la tabla conservando solo la fila más reciente de cada módulo por ruta
+    cursor.execute('''
+        CREATE TABLE odoo_modules_new
+        (id INTEGER PRIMARY KEY, module_name TEXT NOT NULL, module_path TEXT, code_content TEXT,
+         test_content TEXT, test_result TEXT, version TEXT, path_id INTEGER,
+         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+         UNIQUE(path_id, module_name),
+         FOREIGN KEY(path_id) REFERENCES odoo_paths(id))
+    ''')
+    cursor.execute('''
+        INSERT INTO odoo_modules_new
+        (id, module_name, module_path, code_content, test_content, test_result, version, path_id, timestamp)
+        SELECT id, module_name, module_path, code_content, test_content, test_result, version,
+               CAST(path_id AS INTEGER), timestamp
+        FROM odoo_modules
+        WHERE module_name IS NOT NULL
+          AND id IN (SELECT MAX(id) FROM odoo_modules GROUP BY path_id, module_name)
+    ''')
+    cursor.execute('DROP TABLE odoo_modules')
+    cursor.execute('ALTER TABLE odoo_modules_new RENAME TO odoo_modules')
+    # El índice único (path_id, module_name) ya cubre las búsquedas por path_id
+    cursor.execute('CREATE INDEX idx_odoo_modules_module_name ON odoo_modules(module_name)')
+
+
+def source_blob_store(cursor):
+    # El código fuente pasa a guardarse una vez por hash, comprimido, fuera de odoo_modules
+    cursor.execute('''
+        CREATE TABLE source_blobs
+        (hash TEXT PRIMARY KEY, size INTEGER, data BLOB) WITHOUT ROWID
+    ''')
+    cursor.execute('ALTER TABLE odoo_modules DROP COLUMN code_content')
+    cursor.execute('ALTER TABLE odoo_modules DROP COLUMN test_content')
+    # Sin blobs previos, el siguiente análisis debe volver a leer todos los archivos
+    cursor.execute('DELETE FROM odoo_module_files')
+    cursor.execute('CREATE INDEX idx_odoo_module_files_hash ON odoo_module_files(hash)')
+
+
+def model_index(cursor):
+    cursor.execute('''
+        CREATE TABLE odoo_models
+        (id INTEGER PRIMARY KEY, path_id INTEGER, module_name TEXT, file_path TEXT,
+         class_name TEXT, model_name TEXT,
+         FOREIGN KEY(path_id) REFERENCES odoo_paths(id))
+    ''')
+    cursor.execute('CREATE INDEX idx_odoo_models_module ON odoo_models(path_id, module_name, file_path)')
+    cursor.execute('CREATE INDEX idx_odoo_models_model_name ON odoo_models(model_name)')
+    cursor.execute('''
+        CREATE TABLE odoo_model_inherits
+        (model_id INTEGER, inherit_name TEXT, FOREIGN KEY(model_id) REFERENCES odoo_models(id))
+    ''')
+    cursor.execute('CREATE INDEX idx_odoo_model_inherits_name ON odoo_model_inherits(inherit_name)')
+    cursor.execute('CREATE INDEX idx_odoo_model_inherits_model ON odoo_model_inherits(model_id)')
+    cursor.execute('''
+        CREATE TABLE odoo_model_fields
+        (model_id INTEGER, field_name TEXT, field_type TEXT, FOREIGN KEY(model_id) REFERENCES odoo_models(id))
+    ''')
+    cursor.execute('CREATE INDEX idx_odoo_model_fields_name ON odoo_model_fields(field_name)')
+    cursor.execute('CREATE INDEX idx_odoo_model_fields_model ON odoo_model_fields(model_id)')
+    cursor.execute('''
+        CREATE TABLE odoo_model_methods
+        (model_id INTEGER, method_name TEXT, FOREIGN KEY(model_id) REFERENCES odoo_models(id))
+    ''')
+    cursor.execute('CREATE INDEX idx_odoo_model_methods_name ON odoo_model_methods(method_name)')
+    cursor.execute('CREATE INDEX idx_odoo_model_methods_model ON odoo_model_methods(model_id)')
+    cursor.execute('''
+        CREATE TABLE odoo_module_depends
+        (path_id INTEGER, module_name TEXT, depends_on TEXT,
+         UNIQUE(path_id, module_name, depends_on),
+         FOREIGN KEY(path_id) REFERENCES odoo_paths(id))
+    ''')
+    cursor.execute('CREATE INDEX idx_odoo_module_depends_on ON odoo_module_depends(depends_on)')
+    # Fuerza a releer y parsear todos los archivos en el siguiente análisis
+    cursor.execute('DELETE FROM odoo_module_files')
+
+
+# Columnas que la migración 7 rellena desde los análisis antiguos; no modificar, las nuevas se añaden en migraciones posteriores
+ENVIRONMENT_METRIC_COLUMNS_V7 = [
+    'cpu_cores', 'cpu_physical_cores', 'cpu_max_frequency_mhz', 'cpu_current_frequency_mhz', 'cpu_usage_percent',
+    'memory_total_gb', 'memory_available_gb', 'memory_used_gb', 'memory_percent',
+    'disk_total_gb', 'disk_used_gb', 'disk_free_gb', 'disk_percent',
+    'net_bytes_sent', 'net_bytes_recv', 'net_packets_sent', 'net_packets_recv',
+    'optimization',
+]
+# Tamaño de la instalación en el momento de cada muestra; los análisis convertidos los dejan en NULL
+MODULE_STAT_COLUMNS = ['module_count', 'tested_module_count', 'module_file_count']
+
+
+def legacy_number(value):
+    # Los análisis en JSON guardaban textos como "3200.00Mhz", "15.50 GB" o "45.0%"
+    if value is None or isinstance(value, (int, float)):
+        return value
+    text = str(value).strip().rstrip('%')
+    for unit in ('Mhz', 'GB', 'MB'):
+        text = text.replace(unit, '')
+    return float(text)
+
+
+def legacy_metrics(analysis):
+    usage = [legacy_number(value) for value in analysis['cpu']['usage_per_core']]
+    return {
+        'cpu_cores': analysis['cpu']['total_cores'],
+        'cpu_physical_cores': analysis['cpu']['physical_cores'],
+        'cpu_max_frequency_mhz': legacy_number(analysis['cpu']['max_frequency']),
+        'cpu_current_frequency_mhz': legacy_number(analysis['cpu']['current_frequency']),
+        'cpu_usage_percent': sum(usage) / len(usage) if usage else 0.0,
+        'memory_total_gb': legacy_number(analysis['memory']['total']),
+        'memory_available_gb': legacy_number(analysis['memory']['available']),
+        'memory_used_gb': legacy_number(analysis['memory']['used']),
+        'memory_percent': legacy_number(analysis['memory']['percentage']),
+        'disk_total_gb': legacy_number(analysis['disk']['total']),
+        'disk_used_gb': legacy_number(analysis['disk']['used']),
+        'disk_free_gb': legacy_number(analysis['disk']['free']),
+        'disk_percent': legacy_number(analysis['disk']['percentage']),
+        'net_bytes_sent': legacy_number(analysis['network']['bytes_sent']) * 1024**2,
+        'net_bytes_recv': legacy_number(analysis['network']['bytes_recv']) * 1024**2,
+        'net_packets_sent': analysis['network']['packets_sent'],
+        'net_packets_recv': analysis['network']['packets_recv'],
+        'optimization': legacy_number(analysis['optimization']),
+    }
+
+
+def environment_metrics_table(cursor):
+    # Una columna numérica por métrica, indexada por tiempo (segundos Unix)
+    columns = ', '.join(f'{column} REAL' for column in ENVIRONMENT_METRIC_COLUMNS_V7 + MODULE_STAT_COLUMNS)
+    cursor.execute(f'CREATE TABLE environment_metrics (id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, {columns})')
+    cursor.execute('CREATE INDEX idx_environment_metrics_timestamp ON environment_metrics(timestamp)')
+
+    cursor.execute("SELECT id, CAST(strftime('%s', timestamp) AS REAL), analysis_data FROM environment_analysis ORDER BY id")
+    rows = []
+    converted = []
+    for analysis_id, timestamp, analysis_data in cursor.fetchall():
+        try:
+            metrics = legacy_metrics(json.loads(analysis_data))
+        except (ValueError, KeyError, TypeError):
+            continue
+        rows.append([timestamp] + [metrics[column] for column in ENVIRONMENT_METRIC_COLUMNS_V7])
+        converted.append((analysis_id,))
+    placeholders = ', '.join('?' for _ in range(len(ENVIRONMENT_METRIC_COLUMNS_V7) + 1))
+    cursor.executemany(f'''
+        INSERT INTO environment_metrics (timestamp, {', '.join(ENVIRONMENT_METRIC_COLUMNS_V7)}) VALUES ({placeholders})
+    ''', rows)
+    # Los análisis que no se pudieron interpretar no se pierden: quedan aparte para revisarlos a mano
+    cursor.executemany('DELETE FROM environment_analysis WHERE id = ?', converted)
+    cursor.execute('SELECT COUNT(*) FROM environment_analysis')
+    if cursor.fetchone()[0]:
+        cursor.execute('ALTER TABLE environment_analysis RENAME TO environment_analysis_unparsed')
+    else:
+        cursor.execute('DROP TABLE environment_analysis')
+
+
+def monitor_tables(cursor):
+    cursor.execute('ALTER TABLE environment_metrics ADD COLUMN cpu_iowait_percent REAL')
+    cursor.execute('ALTER TABLE environment_metrics ADD COLUMN swap_percent REAL')
+    # Muestras por disco, interfaz de red o proceso (odoo-bin, postgres)
+    cursor.execute('''
+        CREATE TABLE resource_samples
+        (id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, kind TEXT NOT NULL, name TEXT NOT NULL,
+         cpu_percent REAL, memory_mb REAL, read_bytes_per_s REAL, write_bytes_per_s REAL)
+    ''')
+    cursor.execute('CREATE INDEX idx_resource_samples_name_timestamp ON resource_samples(kind, name, timestamp)')
+    cursor.execute('CREATE INDEX idx_resource_samples_timestamp ON resource_samples(timestamp)')
+
+
+def score_components(cursor):
+    # Desglose del motor de puntuación; las filas anteriores quedan en NULL
+    for component in ['cpu', 'memory', 'swap', 'io', 'disk']:
+        cursor.execute(f'ALTER TABLE environment_metrics ADD COLUMN score_{component} REAL')
+
+
+def test_results_table(cursor):
+    # Una fila por ejecución de odoo-bin y otra por cada prueba individual, con el traceback si falló
+    cursor.execute('''
+        CREATE TABLE odoo_test_runs
+        (id INTEGER PRIMARY KEY, started REAL NOT NULL, duration REAL, modules TEXT, status TEXT, return_code INTEGER)
+    ''')
+    cursor.execute('''
+        CREATE TABLE odoo_test_results
+        (id INTEGER PRIMARY KEY, run_id INTEGER NOT NULL, module_name TEXT NOT NULL, test_class TEXT NOT NULL,
+         test_method TEXT NOT NULL, status TEXT NOT NULL, duration REAL, message TEXT,
+         FOREIGN KEY(run_id) REFERENCES odoo_test_runs(id))
+    ''')
+    cursor.execute('CREATE INDEX idx_odoo_test_results_run ON odoo_test_results(run_id)')
+    cursor.execute('CREATE INDEX idx_odoo_test_results_module ON odoo_test_results(module_name, status)')
+
+
+def test_cache_tables(cursor):
+    # Veredictos en verde por clave de contenido; kind distingue unittest del análisis y odoo-bin
+    cursor.execute('''
+        CREATE TABLE test_cache
+        (kind TEXT NOT NULL, cache_key TEXT NOT NULL, module_name TEXT NOT NULL, summary TEXT, created REAL,
+         hits INTEGER NOT NULL DEFAULT 0,
+         PRIMARY KEY (kind, cache_key)) WITHOUT ROWID
+    ''')
+    cursor.execute('CREATE INDEX idx_test_cache_module ON test_cache(module_name)')
+    cursor.execute('''
+        CREATE TABLE test_cache_stats
+        (kind TEXT PRIMARY KEY, hits INTEGER NOT NULL DEFAULT 0, misses INTEGER NOT NULL DEFAULT 0)
+    ''')
+
+
+def source_search_index(cursor):
+    # Índice de texto completo sin contenido propio: el texto se lee de source_blobs y
+    # source_search_docs asigna a cada hash su rowid, así un archivo repetido se indexa una vez
+    cursor.execute('CREATE TABLE source_search_docs (id INTEGER PRIMARY KEY, hash TEXT NOT NULL UNIQUE)')
+    cursor.execute("CREATE VIRTUAL TABLE source_search USING fts5(content, content='')")
+    reader = cursor.connection.cursor()
+    reader.execute('SELECT hash, data FROM source_blobs')
+    while True:
+        rows = reader.fetchmany(500)
+        if not rows:
+            break
+        for file_hash, data in rows:
+            cursor.execute('INSERT INTO source_search_docs (hash) VALUES (?)', (file_hash,))
+            cursor.execute('INSERT INTO source_search (rowid, content) VALUES (?, ?)',
+                           (cursor.lastrowid, decode_source(zlib.decompress(data))))
+
+
+def performance_tables(cursor):
+    # Tramos y contadores volcados por sesión (arranque del proceso) y capturas de perfilado
+    cursor.execute('''
+        CREATE TABLE performance_metrics
+        (id INTEGER PRIMARY KEY, timestamp REAL NOT NULL, session REAL NOT NULL, kind TEXT NOT NULL,
+         name TEXT NOT NULL, calls INTEGER NOT NULL, total REAL NOT NULL, max_value REAL)
+    ''')
+    cursor.execute('CREATE INDEX idx_performance_metrics_session ON performance_metrics(session, kind, name)')
+    cursor.execute('''
+        CREATE TABLE profile_captures
+        (id INTEGER PRIMARY KEY, started REAL NOT NULL, duration REAL, label TEXT, peak_memory INTEGER, report TEXT)
+    ''')
+
+
+ENVIRONMENT_METRIC_COLUMNS = ENVIRONMENT_METRIC_COLUMNS_V7 + [
+    'cpu_iowait_percent', 'swap_percent',
+    'score_cpu', 'score_memory', 'score_swap', 'score_io', 'score_disk',
+] + MODULE_STAT_COLUMNS
+
+
+MIGRATIONS = [
+    (1, create_base_tables),
+    (2, add_legacy_module_columns),
+    (3, create_module_files),
+    (4, unique_odoo_modules),
+    (5, source_blob_store),
+    (6, model_index),
+    (7, environment_metrics_table),
+    (8, monitor_tables),
+    (9, score_components),
+    (10, test_results_table),
+    (11, test_cache_tables),
+    (12, source_search_index),
+    (13, performance_tables),
+]
@@ -0,0 +1,43 @@
+# module_manifest.py
+import os
+import hashlib
+from odoo_discovery import iter_module_files
+from instrumentation import span, count
+
+
+def hash_bytes(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def decode_source(data):
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return data.decode('iso-8859-1')
+
+
+def iter_source_records(module_path, previous=None, exclude=None):
+    """Genera (módulo, ruta_relativa, mtime, size, hash, bytes) por cada .py del módulo.
+
+    bytes es None cuando el mtime y el tamaño coinciden con el manifest previo;
+    en ese caso el archivo no se lee y se reutiliza el hash guardado.
+    """
+    previous = previous or {}
+    module_name = os.path.basename(module_path)
+    for file_path in iter_module_files(module_path, exclude):
+        rel_path = os.path.relpath(file_path, module_path)
+        stat = os.stat(file_path)
+        old = previous.get(rel_path)
+        if old and old[0] == stat.st_mtime and old[1] == stat.st_size:
+            yield module_name, rel_path, stat.st_mtime, stat.st_size, old[2], None
+            continue
+        with span('file.read'), open(file_path, 'rb') as f:
+            data = f.read()
+        count('bytes_read', len(data))
+        yield module_name, rel_path, stat.st_mtime, stat.st_size, hash_bytes(data), data
+
+
+def manifest_changed(previous, manifest):
+    if not previous or previous.keys() != manifest.keys():
+        return True
+    return any(previous[path][2] != entry[2] for path, entry in manifest.items())
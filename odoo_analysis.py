@@ -4,89 +4,276 @@ import os
 import ast
 import sys
 import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from PyQt6.QtCore import QThread, pyqtSignal
+from database_manager import DatabaseManager, ConnectionPool
+from odoo_discovery import ModuleDiscovery, iter_module_files
+from odoo_index import parse_models
+from module_manifest import iter_source_records, manifest_changed, decode_source
+from verdict_cache import manifest_hash
+from instrumentation import instrumentation, span, profiled
+
+# Conexión propia de cada proceso del pool, abierta en init_worker
+worker_db = None
+# Con spawn cada worker tarda en arrancar: por debajo de estos módulos cambiados se analiza en serie
+POOL_MIN_MODULES = 8
 
 class OdooAnalysisThread(QThread):
     progress_update = pyqtSignal(int, str)
     result_ready = pyqtSignal(str)
-    module_analyzed = pyqtSignal(str, str, str, str, str, int, str)
+    module_analyzed = pyqtSignal(str, str, int, int, int)
+    module_failed = pyqtSignal(str, str)
 
-    def __init__(self, odoo_path, path_id):
+    def __init__(self, odoo_path, path_id, db_name, previous_manifests=None, incremental=True, max_workers=None,
+                 include=None, exclude=None, use_test_cache=True):
         super().__init__()
         self.odoo_path = odoo_path
+        self.discovery = ModuleDiscovery(odoo_path, include, exclude)
         self.path_id = path_id
+        self.db_name = db_name
+        self.previous_manifests = previous_manifests or {}
+        self.incremental = incremental
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.use_test_cache = use_test_cache
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
 
     def run(self):
+        with profiled():
+            self.analyze()
+
+    def analyze(self):
         modules = []
-        total_modules = sum(1 for _ in os.scandir(self.odoo_path) if _.is_dir())
+        skipped_modules = 0
+        bytes_read = 0
         analyzed_modules = 0
+        discovered = set()
+        errors = []
+
+        for result in self.iter_results(self.discovery.iter_modules()):
+            discovered.add(result['name'])
+            bytes_read += result['bytes_read']
+            if result.get('error'):
+                errors.append(f"{result['name']}: {result['error']}")
+                self.module_failed.emit(result['name'], result['error'])
+                message = f"Error en el módulo {result['name']}: {result['error']}"
+            elif result['changed']:
+                self.module_analyzed.emit(result['name'], result['version'], self.path_id, result['files'], result['bytes_read'])
+                modules.append({"name": result['name'], "path": result['path'], "version": result['version']})
+                message = f"Analizando módulo: {result['name']}"
+            else:
+                skipped_modules += 1
+                message = f"Módulo sin cambios: {result['name']}"
 
-        for module_name in os.scandir(self.odoo_path):
-            if module_name.is_dir():
-                module_path = module_name.path
-                code_content = ""
-                test_content = ""
-                version = "Unknown"
-                test_result = ""
-
-                # Obtener la versión del módulo
-                manifest_path = os.path.join(module_path, '__manifest__.py')
-                if os.path.exists(manifest_path):
-                    with open(manifest_path, 'r', encoding='utf-8') as manifest_file:
-                        manifest_content = manifest_file.read()
-                        try:
-                            manifest_dict = ast.literal_eval(manifest_content)
-                            version = manifest_dict.get('version', 'Unknown')
-                        except:
-                            pass
-
-                # Buscar la carpeta de tests
-                tests_folder = os.path.join(module_path, 'tests')
-                if os.path.exists(tests_folder) and os.path.isdir(tests_folder):
-                    for file in os.listdir(tests_folder):
-                        if file.endswith('.py'):
-                            file_path = os.path.join(tests_folder, file)
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    test_content += f"# File: {file}\n{f.read()}\n\n"
-                            except UnicodeDecodeError:
-                                with open(file_path, 'r', encoding='iso-8859-1') as f:
-                                    test_content += f"# File: {file}\n{f.read()}\n\n"
-                    
-                    # Ejecutar pruebas unitarias
-                    test_result = self.run_unittest(tests_folder)
-
-                # Analizar archivos del módulo (excluyendo tests)
-                for root, dirs, files in os.walk(module_path):
-                    if 'tests' in root.split(os.path.sep):
-                        continue
-                    for file in files:
-                        if file.endswith('.py'):
-                            file_path = os.path.join(root, file)
-                            try:
-                                with open(file_path, 'r', encoding='utf-8') as f:
-                                    code_content += f"# File: {file}\n{f.read()}\n\n"
-                            except UnicodeDecodeError:
-                                with open(file_path, 'r', encoding='iso-8859-1') as f:
-                                    code_content += f"# File: {file}\n{f.read()}\n\n"
-
-                self.module_analyzed.emit(module_name.name, module_path, code_content, test_content, version, self.path_id, test_result)
-                modules.append({"name": module_name.name, "path": module_path, "version": version})
-                
-                analyzed_modules += 1
-                progress = (analyzed_modules / total_modules) * 100
-                self.progress_update.emit(int(progress), f"Analizando módulo: {module_name.name}")
+            analyzed_modules += 1
+            progress = (analyzed_modules / self.discovery.module_count) * 100
+            self.progress_update.emit(int(progress), message)
 
+        removed = [] if self.cancelled else self.remove_deleted_modules(discovered)
         result = f"Se han encontrado y analizado {len(modules)} módulos de Odoo en la ruta: {self.odoo_path}"
+        if self.cancelled:
+            result = f"Análisis cancelado en la ruta {self.odoo_path} tras {analyzed_modules} módulos"
+        if skipped_modules:
+            result += f" ({skipped_modules} módulos sin cambios omitidos)"
+        if self.discovery.skipped_count:
+            result += f"\nCarpetas ignoradas (sin __manifest__.py o fuera del filtro): {self.discovery.skipped_count}"
+        if removed:
+            result += f"\nMódulos eliminados de la ruta: {', '.join(sorted(removed))}"
+        if errors:
+            result += f"\nMódulos con errores ({len(errors)}), no actualizados:\n" + "\n".join(errors)
+        result += f"\nDatos leídos: {bytes_read / (1024**2):.2f} MB"
         self.result_ready.emit(result)
 
-    def run_unittest(self, tests_folder):
+    def remove_deleted_modules(self, discovered):
+        # Solo los que ya no tienen __manifest__.py: los que excluye un filtro siguen existiendo
+        with ConnectionPool.for_database(self.db_name).connection() as db:
+            removed = [module_name for module_name in db.get_path_modules(self.path_id) - discovered
+                       if not os.path.isfile(os.path.join(self.odoo_path, module_name, '__manifest__.py'))]
+            db.remove_modules(self.path_id, removed)
+        return removed
+
+    def iter_results(self, module_entries):
+        # Devuelve los resultados a medida que terminan, no en orden de envío
+        exclude = self.discovery.exclude
+        jobs = []
+        with span('discovery'):
+            module_entries = list(module_entries)
+        for entry in module_entries:
+            previous = self.previous_manifests.get(entry.name) if self.incremental else None
+            # Comparar mtime y tamaño es barato: los módulos intactos no llegan a los workers
+            if previous and unchanged_on_disk(entry.path, previous, exclude):
+                yield {"name": entry.name, "path": entry.path, "changed": False, "files": len(previous),
+                       "bytes_read": 0, "version": "Unknown"}
+                continue
+            jobs.append((entry.path, self.path_id, previous, self.incremental, exclude, self.use_test_cache))
+        if not jobs:
+            return
+        # Más procesos que CPUs solo añaden arranques: el parseo y unittest compiten por la misma CPU
+        workers = min(self.max_workers, os.cpu_count() or 1, len(jobs))
+        if workers == 1 or len(jobs) < POOL_MIN_MODULES:
+            with ConnectionPool.for_database(self.db_name).connection() as db:
+                for job in jobs:
+                    if self.cancelled:
+                        return
+                    yield analyze_module_safely(*job, db)
+            return
+
+        # spawn también en Linux: un fork desde un proceso con hilos de Qt, voz y trabajos puede heredar
+        # un lock tomado y bloquear el worker; además es como se comporta en Windows
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker,
+                                 initargs=(self.db_name,), mp_context=multiprocessing.get_context('spawn')) as executor:
+            futures = [executor.submit(analyze_module_in_worker, *job) for job in jobs]
+            for future in as_completed(futures):
+                if self.cancelled:
+                    # Los módulos en curso terminan; los pendientes no llegan a empezar
+                    executor.shutdown(cancel_futures=True)
+                    return
+                result = future.result()
+                instrumentation.merge(result.pop('metrics'))
+                yield result
+
+
+def unchanged_on_disk(module_path, previous, exclude):
+    """True si el módulo tiene los mismos archivos, con el mismo mtime y tamaño, que su manifest previo."""
+    files = 0
+    try:
+        for file_path in iter_module_files(module_path, exclude):
+            old = previous.get(os.path.relpath(file_path, module_path))
+            stat = os.stat(file_path)
+            if old is None or old[0] != stat.st_mtime or old[1] != stat.st_size:
+                return False
+            files += 1
+    except OSError:
+        # Que lo analice analyze_module_safely y lo registre como error
+        return False
+    return files == len(previous)
+
+
+def init_worker(db_name):
+    global worker_db
+    worker_db = DatabaseManager(db_name)
+
+
+def analyze_module_in_worker(module_path, path_id, previous, incremental, exclude, use_test_cache):
+    result = analyze_module_safely(module_path, path_id, previous, incremental, exclude, use_test_cache, worker_db)
+    # Los tramos medidos en este proceso viajan con el resultado hasta el proceso principal
+    result['metrics'] = instrumentation.drain()
+    return result
+
+
+def analyze_module_safely(module_path, path_id, previous, incremental, exclude, use_test_cache, db):
+    # Un archivo ilegible (enlace roto, permisos) invalida solo su módulo, no el análisis de la ruta
+    try:
+        return analyze_module(module_path, path_id, previous, incremental, exclude, use_test_cache, db)
+    except Exception as e:
+        return {"name": os.path.basename(module_path), "path": module_path, "changed": False, "files": 0,
+                "bytes_read": 0, "version": "Unknown", "error": f"{type(e).__name__}: {e}"}
+
+
+def analyze_module(module_path, path_id, previous, incremental, exclude, use_test_cache, db):
+    """Ingresa el módulo en la base de datos y devuelve solo un resumen ligero."""
+    with span('module.analyze'):
+        return ingest_module(module_path, path_id, previous, incremental, exclude, use_test_cache, db)
+
+
+def ingest_module(module_path, path_id, previous, incremental, exclude, use_test_cache, db):
+    previous = previous or {}
+    module_name = os.path.basename(module_path)
+    manifest = {}
+    manifest_source = None
+    file_models = {}
+    blobs = {}
+    bytes_read = 0
+
+    # Lectura y parseo fuera de cualquier transacción: el bloqueo de escritura de SQLite
+    # se toma una sola vez, al final, y solo para escribir
+    for _, rel_path, mtime, size, file_hash, data in iter_source_records(module_path, previous, exclude):
+        manifest[rel_path] = (mtime, size, file_hash)
+        if data is None:
+            continue
+        bytes_read += len(data)
+        if rel_path == '__manifest__.py':
+            manifest_source = data
+        if previous.get(rel_path, (None, None, None))[2] != file_hash:
+            blobs[file_hash] = data
+            # Solo se vuelven a parsear los archivos cuyo contenido cambió
+            with span('models.parse'):
+                file_models[rel_path] = parse_models(decode_source(data))
+
+    result = {
+        "name": module_name,
+        "path": module_path,
+        "changed": not incremental or manifest_changed(previous, manifest),
+        "files": len(manifest),
+        "bytes_read": bytes_read,
+        "version": "Unknown",
+    }
+    if not result['changed']:
+        # Sin cambios de contenido: solo se refrescan mtimes si hizo falta
+        if manifest != previous:
+            db.save_module_manifest(module_name, path_id, manifest)
+        return result
+
+    # Obtener la versión y las dependencias del módulo
+    depends = []
+    manifest_path = os.path.join(module_path, '__manifest__.py')
+    if manifest_source is None and os.path.exists(manifest_path):
+        with open(manifest_path, 'rb') as f:
+            manifest_source = f.read()
+    if manifest_source is not None:
         try:
-            result = subprocess.run(
-                [sys.executable, "-m", "unittest", "discover", tests_folder],
-                capture_output=True,
-                text=True
-            )
-            return result.stdout + result.stderr
-        except Exception as e:
-            return f"Error al ejecutar pruebas: {str(e)}"
\ No newline at end of file
+            with span('manifest.parse'):
+                manifest_dict = ast.literal_eval(decode_source(manifest_source))
+            result['version'] = manifest_dict.get('version', 'Unknown')
+            depends = [depend for depend in manifest_dict.get('depends', []) if isinstance(depend, str)]
+        except:
+            pass
+
+    # Ejecutar pruebas unitarias si el módulo tiene carpeta de tests
+    test_result = ""
+    tests_folder = os.path.join(module_path, 'tests')
+    if os.path.isdir(tests_folder):
+        test_result = run_cached_unittest(module_name, tests_folder, manifest, use_test_cache, db)
+
+    with db.batch():
+        db.save_source_blobs(blobs)
+        db.save_odoo_module(module_name, module_path, result['version'], path_id)
+        db.update_test_result(module_name, test_result, path_id)
+        db.save_module_manifest(module_name, path_id, manifest)
+        db.save_module_depends(path_id, module_name, depends)
+        # Los archivos eliminados se quedan sin modelos indexados; en un análisis completo no hay
+        # manifest previo con el que compararlos, así que se vacía todo el índice del módulo
+        if not incremental:
+            db.clear_module_index(path_id, module_name)
+        file_models.update({rel_path: [] for rel_path in previous if rel_path not in manifest})
+        db.save_file_index(path_id, module_name, file_models)
+    return result
+
+
+def run_cached_unittest(module_name, tests_folder, manifest, use_test_cache, db):
+    # unittest se ejecuta aislado en la carpeta de tests: la clave es solo el contenido del propio módulo
+    keys = {module_name: manifest_hash(manifest)}
+    if use_test_cache:
+        cached = db.lookup_test_cache('unittest', keys)
+        if module_name in cached:
+            return cached[module_name]
+    with span('unittest.run'):
+        passed, output = run_unittest(tests_folder)
+    if passed:
+        db.save_test_cache('unittest', [(module_name, keys[module_name], output)])
+    return output
+
+
+def run_unittest(tests_folder):
+    try:
+        result = subprocess.run(
+            [sys.executable, "-m", "unittest", "discover", tests_folder],
+            capture_output=True,
+            text=True
+        )
+        return result.returncode == 0, result.stdout + result.stderr
+    except Exception as e:
+        return False, f"Error al ejecutar pruebas: {str(e)}"
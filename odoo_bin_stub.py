@@ -0,0 +1,56 @@
+# odoo_bin_stub.py
+"""Sustituto local de odoo-bin para probar el ejecutor de tests sin un servidor Odoo.
+
+Acepta los argumentos que usa Zegion (-c, -d, -i, -u, ...) y escribe en stderr
+un log con el formato de --log-level=test: tres pruebas por módulo.
+ZEGION_STUB_TEST_SECONDS fija la duración de cada prueba y ZEGION_STUB_FAIL
+lista, separados por comas, los módulos cuya segunda prueba falla.
+"""
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+
+def log(level, database, logger, message):
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S,%f')[:-3]
+    print(f"{timestamp} {os.getpid()} {level} {database} {logger}: {message}", file=sys.stderr, flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('-c')
+    parser.add_argument('-d', default='stub')
+    parser.add_argument('-i', default='')
+    parser.add_argument('-u', default='')
+    parser.add_argument('--test-enable', action='store_true')
+    parser.add_argument('--stop-after-init', action='store_true')
+    parser.add_argument('--log-level')
+    args = parser.parse_args()
+
+    test_seconds = float(os.environ.get('ZEGION_STUB_TEST_SECONDS', '0.05'))
+    failing = set(filter(None, os.environ.get('ZEGION_STUB_FAIL', '').split(',')))
+    failed = False
+    for module_name in filter(None, args.i.split(',')):
+        log('INFO', args.d, 'odoo.modules.loading', f"Loading module {module_name}")
+        if not args.test_enable:
+            continue
+        logger = f"odoo.addons.{module_name}.tests.test_stub"
+        for index in range(3):
+            log('INFO', args.d, logger, f"Starting TestStub.test_{index} ...")
+            time.sleep(test_seconds)
+            if index == 1 and module_name in failing:
+                # Como Odoo, el traceback sigue al mensaje en líneas sin cabecera de log
+                log('ERROR', args.d, logger, f"FAIL: TestStub.test_{index}\n"
+                    "Traceback (most recent call last):\n"
+                    f'  File "{module_name}/tests/test_stub.py", line 12, in test_{index}\n'
+                    "    self.assertEqual(total, 10)\n"
+                    "AssertionError: 9 != 10")
+                failed = True
+    log('INFO', args.d, 'odoo.service.server', "Stopping gracefully")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
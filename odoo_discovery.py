@@ -0,0 +1,45 @@
+# odoo_discovery.py
+import os
+from fnmatch import fnmatch
+
+# Directorios que nunca contienen código Python de interés para el análisis.
+# 'tests' se recorre a propósito: sus archivos alimentan el manifest y las pruebas.
+DEFAULT_EXCLUDE = ['static', 'node_modules', 'i18n', '__pycache__', '.*']
+
+
+def matches_any(name, patterns):
+    return any(fnmatch(name, pattern) for pattern in patterns)
+
+
+class ModuleDiscovery:
+    """Descubre módulos Odoo (carpetas con __manifest__.py) en una sola pasada."""
+
+    def __init__(self, odoo_path, include=None, exclude=None):
+        self.odoo_path = odoo_path
+        self.include = include or ['*']
+        self.exclude = DEFAULT_EXCLUDE if exclude is None else exclude
+        self.module_count = 0
+        self.skipped_count = 0
+
+    def iter_modules(self):
+        # Los contadores crecen a medida que se consume el generador
+        with os.scandir(self.odoo_path) as entries:
+            for entry in entries:
+                if not entry.is_dir() or matches_any(entry.name, self.exclude):
+                    continue
+                if not matches_any(entry.name, self.include) or \
+                        not os.path.isfile(os.path.join(entry.path, '__manifest__.py')):
+                    self.skipped_count += 1
+                    continue
+                self.module_count += 1
+                yield entry
+
+
+def iter_module_files(module_path, exclude=None, extension='.py'):
+    exclude = DEFAULT_EXCLUDE if exclude is None else exclude
+    for root, dirs, files in os.walk(module_path):
+        # Poda en sitio: os.walk no desciende a los directorios eliminados
+        dirs[:] = [d for d in dirs if not matches_any(d, exclude)]
+        for file in files:
+            if file.endswith(extension):
+                yield os.path.join(root, file)
@@ -0,0 +1,73 @@
+# odoo_index.py
+import ast
+
+
+def literal_names(node):
+    # _inherit admite tanto 'modelo' como ['modelo.a', 'modelo.b']
+    try:
+        value = ast.literal_eval(node)
+    except (ValueError, SyntaxError):
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, (list, tuple)):
+        return [item for item in value if isinstance(item, str)]
+    return []
+
+
+def field_type(node):
+    # Reconoce declaraciones del tipo fields.Char(...) / fields.Many2one(...)
+    if isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) \
+            and isinstance(node.func.value, ast.Name) and node.func.value.id == 'fields':
+        return node.func.attr
+    return None
+
+
+def iter_classes(body):
+    # Solo sentencias de primer nivel y cuerpos de clase: ast.walk visitaría cada expresión
+    for node in body:
+        if isinstance(node, ast.ClassDef):
+            yield node
+            yield from iter_classes(node.body)
+
+
+def parse_models(source):
+    """Extrae los modelos Odoo declarados en un archivo Python.
+
+    Devuelve una lista de dicts con class_name, model_name, inherits,
+    fields [(nombre, tipo)] y methods [nombre]. Las clases sin _name ni
+    _inherit se ignoran.
+    """
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return []
+
+    models = []
+    for node in iter_classes(tree.body):
+        model_name = None
+        inherits = []
+        fields = []
+        methods = []
+        for item in node.body:
+            if isinstance(item, ast.Assign) and len(item.targets) == 1 and isinstance(item.targets[0], ast.Name):
+                target = item.targets[0].id
+                if target == '_name':
+                    names = literal_names(item.value)
+                    model_name = names[0] if names else None
+                elif target == '_inherit':
+                    inherits = literal_names(item.value)
+                elif field_type(item.value):
+                    fields.append((target, field_type(item.value)))
+            elif isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                methods.append(item.name)
+        if model_name is None and not inherits:
+            continue
+        models.append({
+            "class_name": node.name,
+            "model_name": model_name or inherits[0],
+            "inherits": inherits,
+            "fields": fields,
+            "methods": methods,
+        })
+    return models
@@ -0,0 +1,344 @@
+# odoo_tests.py
+import os
+import re
+import time
+import queue
+import shlex
+import threading
+import subprocess
+from uuid import uuid4
+from collections import deque
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from PyQt6.QtCore import QThread, pyqtSignal
+from instrumentation import span, profiled
+
+# 2024-01-31 10:00:00,123 4321 INFO db_name odoo.addons.sale.tests.test_sale: mensaje
+LOG_LINE = re.compile(r'^(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d,\d{3}) \d+ (\w+) (\S+) ([\w.]+): (.*)$')
+TEST_LOGGER = re.compile(r'^odoo\.addons\.(\w+)\.tests\b')
+TEST_START = re.compile(r'^Starting (\w+)\.(\w+)\b')
+TEST_FAILURE = re.compile(r'^(FAIL|ERROR): (\w+)\.(\w+)\b')
+MAX_ERROR_LINES = 50
+# Líneas de traceback que se conservan por cada entrada de error
+MAX_ERROR_ENTRY_LINES = 200
+
+
+class OdooLogParser:
+    """Convierte el log de pruebas de odoo-bin en registros por prueba.
+
+    Odoo ejecuta las pruebas de una en una: cada prueba termina al empezar la
+    siguiente, al cargar el siguiente módulo o con la última línea del log.
+    """
+
+    def __init__(self):
+        self.records = []
+        self.current = None
+        self.errors = deque(maxlen=MAX_ERROR_LINES)
+        # Entrada de error abierta: las líneas sin cabecera de log que siguen (traceback, mensaje) son suyas
+        self.error_entry = None
+        self.last_timestamp = None
+
+    def feed(self, line):
+        match = LOG_LINE.match(line)
+        if not match:
+            if self.error_entry is not None and len(self.error_entry) < MAX_ERROR_ENTRY_LINES:
+                self.error_entry.append(line)
+            return
+        timestamp, level, _, logger, message = match.groups()
+        timestamp = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S,%f')
+        self.last_timestamp = timestamp
+        self.error_entry = None
+        if level in ('ERROR', 'CRITICAL'):
+            self.error_entry = [line]
+            self.errors.append(self.error_entry)
+        if logger == 'odoo.modules.loading':
+            self.finish(timestamp)
+            return
+
+        logger_match = TEST_LOGGER.match(logger)
+        if not logger_match:
+            return
+        module_name = logger_match.group(1)
+
+        start = TEST_START.match(message)
+        if start:
+            self.finish(timestamp)
+            self.current = {
+                "module": module_name,
+                "test_class": start.group(1),
+                "test_method": start.group(2),
+                "status": "passed",
+                "started": timestamp,
+            }
+            return
+
+        failure = TEST_FAILURE.match(message)
+        if failure:
+            status = 'failed' if failure.group(1) == 'FAIL' else 'error'
+            test = (module_name,) + failure.group(2, 3)
+            # Odoo puede resumir los fallos al final de la clase, con la prueba ya cerrada
+            for record in filter(None, [self.current] + self.records[::-1]):
+                if (record['module'], record['test_class'], record['test_method']) == test:
+                    record['status'] = status
+                    # La lista sigue creciendo con el traceback; se convierte en texto al cerrar
+                    record['message'] = self.error_entry
+                    break
+
+    def finish(self, timestamp):
+        if self.current:
+            self.current['duration'] = (timestamp - self.current.pop('started')).total_seconds()
+            self.records.append(self.current)
+            self.current = None
+
+    def close(self):
+        self.finish(self.last_timestamp)
+        for record in self.records:
+            if isinstance(record.get('message'), list):
+                record['message'] = "\n".join(record['message'])
+        return self.records
+
+    def error_messages(self):
+        return ["\n".join(entry) for entry in self.errors]
+
+
+class OdooTestRunner:
+    """Ejecuta odoo-bin leyendo stdout y stderr a la vez, con cancelación y tiempo límite."""
+
+    def __init__(self, command, env=None, timeout=None, on_output=None, throttle_seconds=0.25, tail_lines=20):
+        self.command = command
+        self.env = env
+        self.timeout = timeout
+        self.on_output = on_output
+        self.throttle_seconds = throttle_seconds
+        self.tail = deque(maxlen=tail_lines)
+        self.cancel_event = threading.Event()
+        self.parser = OdooLogParser()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def run(self):
+        process = subprocess.Popen(self.command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+                                   errors='replace', env=self.env)
+        lines = queue.Queue()
+        # Un hilo por tubería: si uno se llena mientras se lee el otro, odoo-bin se bloquea
+        readers = [threading.Thread(target=pump, args=(stream, lines), daemon=True)
+                   for stream in (process.stdout, process.stderr)]
+        for reader in readers:
+            reader.start()
+
+        status = None
+        started = time.monotonic()
+        last_emit = 0.0
+        open_streams = len(readers)
+        while open_streams:
+            if status is None and self.cancel_event.is_set():
+                status = 'cancelled'
+                process.kill()
+            elif status is None and self.timeout and time.monotonic() - started > self.timeout:
+                status = 'timeout'
+                process.kill()
+            try:
+                line = lines.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            if line is None:
+                open_streams -= 1
+                continue
+            self.parser.feed(line)
+            self.tail.append(line)
+            # La interfaz se actualiza como mucho cada throttle_seconds, no por cada línea
+            if self.on_output and time.monotonic() - last_emit >= self.throttle_seconds:
+                last_emit = time.monotonic()
+                self.on_output("\n".join(self.tail))
+
+        return_code = process.wait()
+        records = self.parser.close()
+        if status is None:
+            failed = any(record['status'] != 'passed' for record in records)
+            status = 'ok' if return_code == 0 and not failed else 'failed'
+        return {
+            "return_code": return_code,
+            "status": status,
+            "records": records,
+            "errors": self.parser.error_messages(),
+            "duration": time.monotonic() - started,
+        }
+
+
+class OdooTestThread(QThread):
+    """Reparte los módulos entre varios odoo-bin simultáneos, cada uno con su propia base de datos.
+
+    Cada shard clona la base de datos plantilla de los ajustes, ejecuta sus
+    módulos en una sola llamada a odoo-bin y borra el clon al terminar.
+    """
+    progress_update = pyqtSignal(int, str)
+    result_ready = pyqtSignal(str)
+    # (inicio, módulos del shard, resultado de OdooTestRunner.run) por cada shard terminado
+    shard_finished = pyqtSignal(float, list, dict)
+
+    def __init__(self, settings, module_names, shards=None, durations=None):
+        super().__init__()
+        self.settings = settings
+        self.module_names = module_names
+        self.shards = shard_modules(module_names, shards or settings['test_shards'], durations)
+        self.runners = {}
+        self.lock = threading.Lock()
+        self.finished_shards = 0
+        self.cancelled = False
+
+    def cancel(self):
+        with self.lock:
+            self.cancelled = True
+            for runner in self.runners.values():
+                runner.cancel()
+
+    def run(self):
+        with profiled():
+            self.run_shards()
+
+    def run_shards(self):
+        try:
+            failures = []
+            totals = {'passed': 0, 'failed': 0, 'error': 0}
+            with ThreadPoolExecutor(max_workers=len(self.shards) or 1) as executor:
+                futures = [executor.submit(self.run_shard, index, modules) for index, modules in enumerate(self.shards)]
+                for future in as_completed(futures):
+                    modules, result = future.result()
+                    self.finished_shards += 1
+                    self.progress_update.emit(self.progress(), f"Shard terminado ({result['status']}): {','.join(modules)}")
+                    for record in result['records']:
+                        totals[record['status']] += 1
+                    if result['status'] != 'ok':
+                        failures.append((modules, result))
+
+            self.result_ready.emit(self.format_result(totals, failures))
+
+        except Exception as e:
+            self.result_ready.emit(f"Error al ejecutar las pruebas: {str(e)}")
+
+    def run_shard(self, index, modules):
+        started = time.time()
+        template = self.settings['test_database']
+        database = f"{template}_zegion_{index}_{uuid4().hex[:8]}"
+        cloned = bool(self.settings['create_database_command'])
+        with self.lock:
+            if self.cancelled:
+                return modules, failed_result('cancelled', "Cancelado antes de empezar")
+            runner = OdooTestRunner(self.shard_command(database if cloned else template, ",".join(modules)),
+                                    self.shard_env(), self.settings['test_timeout'],
+                                    lambda output: self.progress_update.emit(self.progress(), f"[shard {index + 1}]\n{output}"))
+            self.runners[index] = runner
+        try:
+            if cloned:
+                with span('odoo_tests.create_database'):
+                    run_database_command(self.settings['create_database_command'], template, database)
+            with span('odoo_tests.shard'):
+                result = runner.run()
+        except DatabaseCommandError as e:
+            result = failed_result('error', f"No se pudo preparar la base de datos {database}: {e}")
+        except OSError as e:
+            # p. ej. odoo_python u odoo_bin no existen o no son ejecutables
+            result = failed_result('error', f"No se pudo ejecutar {shlex.join(runner.command)}: {e}")
+        finally:
+            if cloned:
+                try:
+                    with span('odoo_tests.drop_database'):
+                        run_database_command(self.settings['drop_database_command'], template, database)
+                except DatabaseCommandError:
+                    pass
+        self.shard_finished.emit(started, modules, result)
+        return modules, result
+
+    def progress(self):
+        return int(self.finished_shards / len(self.shards) * 100) if self.shards else 100
+
+    def shard_command(self, database, module_names):
+        return [
+            self.settings['odoo_python'],
+            self.settings['odoo_bin'],
+            "-c", self.settings['odoo_config'],
+            "-d", database,
+            "--test-enable",
+            "--stop-after-init",
+            "--log-level=test",
+            "-i", module_names,
+            "-u", module_names
+        ]
+
+    def shard_env(self):
+        # El PYTHONPATH solo se pasa al proceso hijo, sin tocar el entorno de Zegion
+        server_path = os.path.dirname(os.path.abspath(self.settings['odoo_bin']))
+        return dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [server_path, os.environ.get('PYTHONPATH')])))
+
+    def format_result(self, totals, failures):
+        module_names = ",".join(self.module_names)
+        summary = (f"Pruebas: {totals['passed']} correctas, {totals['failed']} fallidas, "
+                   f"{totals['error']} con error ({len(self.shards)} shards)")
+        if self.cancelled:
+            return f"Pruebas canceladas para el módulo {module_names}.\n{summary}"
+        if not failures:
+            return f"Pruebas completadas exitosamente para el módulo {module_names}\n{summary}"
+        lines = [summary]
+        for modules, result in failures:
+            lines.append(f"\nError en las pruebas del módulo {','.join(modules)} ({result['status']}). "
+                         f"Código de salida: {result['return_code']}")
+            failed_records = [record for record in result['records'] if record['status'] != 'passed']
+            for record in failed_records:
+                lines.append(f"  {record['module']}: {record['test_class']}.{record['test_method']} ({record['status']})")
+                if record.get('message'):
+                    lines.append("    " + record['message'].replace("\n", "\n    "))
+            # Los errores que no pertenecen a ninguna prueba (p. ej. al cargar el módulo) se muestran aparte
+            messages = {record.get('message') for record in failed_records}
+            errors = [error for error in result['errors'] if error not in messages]
+            if errors:
+                lines.append("\nError:\n" + "\n".join(errors))
+        return "\n".join(lines)
+
+
+def shard_modules(module_names, shards, durations=None):
+    """Reparte los módulos en hasta `shards` grupos con una duración estimada parecida.
+
+    durations son los segundos de pruebas medidos en ejecuciones anteriores; los
+    módulos sin historial cuentan como la media. Cada grupo conserva el orden de entrada.
+    """
+    durations = durations or {}
+    known = [durations[module] for module in module_names if module in durations]
+    default = sum(known) / len(known) if known else 1.0
+    groups = [[] for _ in range(max(1, min(shards, len(module_names))))]
+    loads = [0.0] * len(groups)
+    # El más largo primero, siempre al grupo menos cargado
+    for module in sorted(module_names, key=lambda module: durations.get(module, default), reverse=True):
+        index = loads.index(min(loads))
+        groups[index].append(module)
+        loads[index] += durations.get(module, default)
+    order = {module: position for position, module in enumerate(module_names)}
+    return [sorted(group, key=order.get) for group in groups if group]
+
+
+class DatabaseCommandError(RuntimeError):
+    """Falló el comando que crea o borra la base de datos de un shard."""
+
+
+def run_database_command(command, template, database):
+    if not command:
+        return
+    args = [part.format(template=template, database=database) for part in command]
+    try:
+        subprocess.run(args, capture_output=True, text=True, check=True)
+    except subprocess.CalledProcessError as e:
+        raise DatabaseCommandError(f"{shlex.join(args)} terminó con código {e.returncode}: {e.stderr.strip()}") from e
+    except OSError as e:
+        raise DatabaseCommandError(f"{shlex.join(args)}: {e}") from e
+
+
+def failed_result(status, message):
+    return {"return_code": None, "status": status, "records": [], "errors": [message], "duration": 0.0}
+
+
+def pump(stream, lines):
+    for line in iter(stream.readline, ''):
+        lines.put(line.rstrip('\n'))
+    stream.close()
+    lines.put(None)
+
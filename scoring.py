@@ -0,0 +1,94 @@
+# scoring.py
+# Motor de puntuación del entorno: cada recurso aporta una puntuación 0-100
+# a partir de la carga medida y del tamaño de la instalación de Odoo.
+
+SCORERS = []
+
+
+def register_scorer(name, weight=1.0):
+    def decorator(function):
+        SCORERS.append((name, weight, function))
+        return function
+    return decorator
+
+
+def headroom(value, comfortable, critical):
+    """1.0 hasta el umbral cómodo, 0.0 desde el crítico, lineal entre ambos."""
+    if value is None:
+        return None
+    if value <= comfortable:
+        return 1.0
+    if value >= critical:
+        return 0.0
+    return 1.0 - (value - comfortable) / (critical - comfortable)
+
+
+def recommended_workers(metrics):
+    # Recomendación habitual de Odoo: 2 workers por núcleo + 1
+    return int(metrics['cpu_cores']) * 2 + 1
+
+
+@register_scorer('cpu', weight=1.0)
+def cpu_score(metrics, workload):
+    score = headroom(metrics.get('cpu_usage_percent'), 60, 95)
+    if score is None:
+        return None
+    workers = workload.get('workers') or recommended_workers(metrics)
+    # Más workers que núcleos pueden atender se traduce en colas y cambios de contexto
+    return score * min(1.0, recommended_workers(metrics) / workers)
+
+
+@register_scorer('memory', weight=1.0)
+def memory_score(metrics, workload):
+    pressure = headroom(metrics.get('memory_percent'), 70, 95)
+    if pressure is None:
+        return None
+    # Cada worker carga el registro completo, que crece con el número de módulos
+    workers = workload.get('workers') or recommended_workers(metrics)
+    estimated_gb = workers * (0.15 + 0.0005 * workload.get('module_count', 0))
+    capacity = headroom(estimated_gb / max(metrics['memory_total_gb'], 1e-6) * 100, 50, 90)
+    return min(pressure, capacity)
+
+
+@register_scorer('swap', weight=0.5)
+def swap_score(metrics, workload):
+    return headroom(metrics.get('swap_percent'), 5, 50)
+
+
+@register_scorer('io', weight=0.75)
+def io_score(metrics, workload):
+    return headroom(metrics.get('cpu_iowait_percent'), 5, 30)
+
+
+@register_scorer('disk', weight=0.5)
+def disk_score(metrics, workload):
+    return headroom(metrics.get('disk_percent'), 80, 95)
+
+
+# Se deriva del registro: un recurso nuevo aparece en el desglose sin tocar esta lista
+SCORE_COMPONENTS = [name for name, _, _ in SCORERS]
+
+
+class ScoringEngine:
+    def __init__(self, scorers=None):
+        self.scorers = SCORERS if scorers is None else scorers
+
+    def score(self, metrics, workload=None):
+        """Devuelve {'score', 'components', 'bottleneck'}; las métricas ausentes no puntúan."""
+        workload = workload or {}
+        components = {}
+        weighted_total = 0.0
+        total_weight = 0.0
+        for name, weight, scorer in self.scorers:
+            value = scorer(metrics, workload)
+            if value is None:
+                continue
+            components[name] = value * 100
+            weighted_total += value * weight
+            total_weight += weight
+        score = weighted_total / total_weight * 100 if total_weight else 0.0
+        # Solo hay cuello de botella si algún recurso está por debajo del máximo
+        bottleneck = min(components, key=components.get) if components else None
+        if bottleneck and components[bottleneck] >= 100:
+            bottleneck = None
+        return {"score": score, "components": components, "bottleneck": bottleneck}
@@ -0,0 +1,52 @@
+# settings.py
+import os
+import json
+from odoo_discovery import DEFAULT_EXCLUDE
+
+SETTINGS_PATH = 'zegion_settings.json'
+
+# {template} y {database} se sustituyen al clonar o borrar la base de datos de cada shard.
+# Un comando vacío desactiva el clonado: todos los shards usan la plantilla (solo para el odoo-bin de prueba).
+DEFAULT_SETTINGS = {
+    "odoo_python": r'D:\Odoo_16\python\python.exe',
+    "odoo_bin": r'D:\Odoo_16\server\odoo-bin',
+    "odoo_config": r'D:\Odoo_16\server\odoo.conf',
+    "test_database": 'ada_16',
+    "max_jobs": 2,
+    "test_shards": 2,
+    "test_timeout": 2 * 3600,
+    "create_database_command": ["createdb", "--template={template}", "{database}"],
+    "drop_database_command": ["dropdb", "--if-exists", "{database}"],
+    # Patrones glob de carpetas de módulos a analizar y de carpetas que se saltan dentro y fuera de ellos
+    "analysis_include": ['*'],
+    "analysis_exclude": DEFAULT_EXCLUDE,
+}
+
+
+def load_settings(path=SETTINGS_PATH):
+    settings = dict(DEFAULT_SETTINGS)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            settings.update(json.load(f))
+    return settings
+
+
+def save_settings(settings, path=SETTINGS_PATH):
+    # Solo se guardan las claves que difieren de los valores por defecto
+    changed = {key: value for key, value in settings.items() if DEFAULT_SETTINGS.get(key) != value}
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(changed, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def parse_setting(key, value):
+    """Convierte el texto de un comando al tipo del valor por defecto de la clave."""
+    if key not in DEFAULT_SETTINGS:
+        raise KeyError(key)
+    default = DEFAULT_SETTINGS[key]
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, list):
+        return json.loads(value) if value.startswith('[') else value.split()
+    return value
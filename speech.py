@@ -0,0 +1,76 @@
+# speech.py
+import threading
+from collections import deque
+import pyttsx3
+from PyQt6.QtCore import QThread
+from instrumentation import span
+
+
+class SpeechWorker(QThread):
+    """Reproduce los mensajes de voz fuera del hilo de la interfaz.
+
+    La cola es acotada: si se llena, se descartan los mensajes más antiguos,
+    porque un aviso de progreso viejo ya no le sirve a nadie.
+    """
+
+    def __init__(self, max_pending=2):
+        super().__init__()
+        self.pending = deque(maxlen=max_pending)
+        self.condition = threading.Condition()
+        self.muted = False
+        self.interrupted = False
+        self.stopping = False
+
+    def say(self, text):
+        if self.muted or not text:
+            return
+        with self.condition:
+            if self.pending and self.pending[-1] == text:
+                return
+            self.pending.append(text)
+            self.condition.notify()
+
+    def interrupt(self):
+        # Corta el mensaje actual y descarta los pendientes
+        with self.condition:
+            self.pending.clear()
+            self.interrupted = True
+
+    def set_muted(self, muted):
+        self.muted = muted
+        if muted:
+            self.interrupt()
+
+    def stop(self):
+        with self.condition:
+            self.stopping = True
+            self.pending.clear()
+            self.interrupted = True
+            self.condition.notify()
+        self.wait()
+
+    def run(self):
+        # pyttsx3 debe crearse y usarse siempre desde el mismo hilo
+        try:
+            engine = pyttsx3.init()
+        except Exception as e:
+            # Sin motor de voz disponible la aplicación sigue funcionando en silencio
+            print(f"Voz no disponible: {e}")
+            self.muted = True
+            return
+        engine.connect('started-word', lambda name, location, length: self.check_interrupt(engine))
+        while True:
+            with self.condition:
+                while not self.pending and not self.stopping:
+                    self.condition.wait()
+                if self.stopping:
+                    return
+                text = self.pending.popleft()
+                self.interrupted = False
+            with span('tts.speak'):
+                engine.say(text)
+                engine.runAndWait()
+
+    def check_interrupt(self, engine):
+        if self.interrupted:
+            engine.stop()
@@ -1,8 +1,10 @@
 # utils.py
 import os
 import sys
+import time
 import venv
 import subprocess
+import importlib.util
 
 required_modules = ['PyQt6', 'pyttsx3', 'psutil', 'tensorflow', 'numpy']
 
@@ -38,9 +40,8 @@ def check_and_install_dependencies():
     generate_requirements()
     missing_modules = []
     for module in required_modules:
-        try:
-            __import__(module)
-        except ImportError:
+        # find_spec localiza el módulo sin importarlo (TensorFlow tarda segundos en cargar)
+        if importlib.util.find_spec(module) is None:
             missing_modules.append(module)
     
     if missing_modules:
@@ -52,4 +53,15 @@ def check_and_install_dependencies():
 
 def is_venv():
     return (hasattr(sys, 'real_prefix') or
-            (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix))
\ No newline at end of file
+            (hasattr(sys, 'base_prefix') and sys.base_prefix != sys.prefix))
+
+class StartupTimer:
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.marks = []
+
+    def mark(self, label):
+        self.marks.append((label, time.perf_counter() - self.start))
+
+    def report(self):
+        return "Tiempo de arranque:\n" + "\n".join(f"  {label}: {elapsed * 1000:.0f} ms" for label, elapsed in self.marks)
\ No newline at end of file
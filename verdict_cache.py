@@ -0,0 +1,27 @@
+# verdict_cache.py
+import hashlib
+
+
+def manifest_hash(manifest):
+    """Hash del contenido de un módulo a partir de su manifest {ruta: (mtime, size, hash)}."""
+    digest = hashlib.sha1()
+    for rel_path in sorted(manifest):
+        digest.update(f"{rel_path}\0{manifest[rel_path][2]}\n".encode())
+    return digest.hexdigest()
+
+
+def module_cache_keys(module_names, module_hashes, graph, context=''):
+    """Clave de caché de cada módulo: su contenido, el de todas sus dependencias y el contexto de ejecución.
+
+    Los módulos que nunca se analizaron no tienen hash y se quedan sin clave (siempre se ejecutan).
+    Las dependencias fuera de las rutas analizadas (p. ej. base) cuentan como contenido vacío.
+    """
+    keys = {}
+    for module_name in module_names:
+        if module_name not in module_hashes:
+            continue
+        digest = hashlib.sha1(context.encode())
+        for name in [module_name] + sorted(graph.transitive_dependencies(module_name)):
+            digest.update(f"{name}\0{module_hashes.get(name, '')}\n".encode())
+        keys[module_name] = digest.hexdigest()
+    return keys
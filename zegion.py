@@ -1,80 +1,53 @@
 import os
-import sys
-import subprocess
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTextEdit, QLabel, QFileDialog, QProgressBar, QPlainTextEdit, QInputDialog
+import time
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QPushButton, QTextEdit, QFileDialog, QProgressBar, QPlainTextEdit, QInputDialog
 from PyQt6.QtGui import QIcon
-from PyQt6.QtCore import Qt, QThread, pyqtSignal
+from PyQt6.QtCore import QTimer
 from database_manager import DatabaseManager
 from environment_analysis import EnvironmentAnalysisThread
-from odoo_analysis import OdooAnalysisThread
+from environment_monitor import EnvironmentMonitorThread
+from scoring import SCORE_COMPONENTS
+from odoo_tests import OdooTestThread
 from mahoraga import Mahoraga
-import pyttsx3
+from dependency_graph import DependencyCycleError
+from speech import SpeechWorker
+from job_manager import JobManager
+from settings import load_settings, save_settings
+from commands import ZegionCommands, CommandRegistry, command
+from instrumentation import instrumentation, flush_metrics
 import json
 
-class OdooTestThread(QThread):
-    progress_update = pyqtSignal(int, str)
-    result_ready = pyqtSignal(str)
-
-    def __init__(self, odoo_path, config_path, db_name, module_name):
-        super().__init__()
-        self.odoo_path = odoo_path
-        self.config_path = config_path
-        self.db_name = db_name
-        self.module_name = module_name
-
-    def run(self):
-        try:
-            # Configurar el PYTHONPATH
-            server_path = os.path.join(self.odoo_path, 'server')
-            sys.path.insert(0, server_path)
-            os.environ['PYTHONPATH'] = f"{server_path};{os.environ.get('PYTHONPATH', '')}"
-
-            # Definir la ruta al ejecutable de Python y odoo-bin
-            python_path = r'D:\Odoo_16\python\python.exe'
-            odoo_bin_path = r'D:\Odoo_16\server\odoo-bin'
-
-            command = [
-                python_path,
-                odoo_bin_path,
-                "-c", self.config_path,
-                "-d", self.db_name,
-                "--test-enable",
-                "--stop-after-init",
-                "--log-level=test",
-                "-i", self.module_name,
-                "-u", self.module_name
-            ]
-            # Ejecutar el comando
-            process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-            print(process)
-            # Leer la salida en tiempo real
-            while True:
-                output = process.stdout.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    self.progress_update.emit(50, output.strip())
-
-            # Obtener el código de retorno
-            rc = process.poll()
-            print(rc)
-            # Emitir el resultado
-            if rc == 0:
-                self.result_ready.emit(f"Pruebas completadas exitosamente para el módulo {self.module_name}")
-            else:
-                stderr_output = process.stderr.read()
-                self.result_ready.emit(f"Error en las pruebas del módulo {self.module_name}. Código de salida: {rc}\n\nError:\n{stderr_output}")
-
-        except Exception as e:
-            self.result_ready.emit(f"Error al ejecutar las pruebas: {str(e)}")
-
-class Zegion(QWidget):
-    def __init__(self):
+class Zegion(ZegionCommands, QWidget):
+    def __init__(self, startup_timer=None):
         super().__init__()
+        self.startup_timer = startup_timer
         self.db_manager = DatabaseManager()
+        self.analysis_workers = os.cpu_count() or 1
+        self.changed_modules = set()
+        self.dependency_graph = None
+        self.monitor_thread = None
+        self.odoo_workers = None
+        self.settings = load_settings()
+        self.test_cache_keys = {}
+        self.cached_test_results = {}
+        self.jobs = JobManager(self.settings['max_jobs'])
+        self.jobs.progress_changed.connect(self.update_progress_with_message)
+        self.jobs.job_finished.connect(self.display_job_result)
+        self.jobs.kind_finished.connect(self.jobs_finished)
+        self.jobs.idle.connect(lambda: self.progress_bar.setVisible(False))
+        self.commands = CommandRegistry(self)
         self.init_ui()
         self.init_tts()
         self.mahoraga = Mahoraga(self.db_manager)
+        # El modelo se carga cuando la ventana ya está en pantalla
+        QTimer.singleShot(0, self.preload_mahoraga)
+        if self.startup_timer:
+            self.startup_timer.mark("interfaz construida")
+
+    def preload_mahoraga(self):
+        future = self.mahoraga.preload()
+        if self.startup_timer:
+            future.add_done_callback(lambda _: self.startup_timer.mark("modelo Mahoraga listo"))
 
     def init_ui(self):
         self.setWindowTitle('Zegion Assistant')
@@ -102,7 +75,19 @@ class Zegion(QWidget):
         self.setLayout(layout)
 
     def init_tts(self):
-        self.engine = pyttsx3.init()
+        self.speech = SpeechWorker()
+        self.speech.start()
+
+    def closeEvent(self, event):
+        self.jobs.cancel()
+        self.jobs.wait()
+        if self.monitor_thread:
+            self.monitor_thread.stop()
+        self.speech.stop()
+        if instrumentation.capture:
+            self.stop_profiling()
+        flush_metrics(self.db_manager)
+        super().closeEvent(event)
 
     def process_command(self):
         command = self.input_text.toPlainText()
@@ -112,119 +97,140 @@ class Zegion(QWidget):
         self.db_manager.save_command_history(command, response)
 
     def execute_command(self, command):
-        if command.lower() == "hola":
-            return "Hello"
-        elif command.lower() == "activar over warrior":
-            return "Modo activo"
-        elif command.lower() == "activo":
-            return f"Path de los módulos: {os.getcwd()}"
-        elif command.lower() == "aprender entorno":
-            self.analyze_environment()
-            return "Iniciando análisis del entorno..."
-        elif command.lower().startswith("add odoo path"):
-            return self.add_odoo_path(command)
-        elif command.lower() == "list odoo paths":
-            return self.list_odoo_paths()
-        elif command.lower() == "analizar modulos odoo":
-            return self.analyze_all_odoo_paths()
-        elif command.lower() == "ejecutar tests odoo":
-            return self.run_odoo_tests()
-        elif command.lower() == "predecir optimización":
-            return self.predict_optimization()
-        elif command.lower() == "run":
-            return self.run()
-        else:
-            return "Comando no reconocido"
-
-    def run(self):
-        self.progress_bar.setVisible(True)
-        
-        # Valores predefinidos para pruebas
-        odoo_path = r'D:\Odoo_16'
-        config_path = r'D:\Odoo_16\server\odoo.conf'
-        db_name = 'ada_16'
-        module_name = 'account_accountant'  # Puedes cambiar esto al módulo que quieras probar
-
-        self.test_thread = OdooTestThread(odoo_path, config_path, db_name, module_name)
-        self.test_thread.progress_update.connect(self.update_progress_with_message)
-        self.test_thread.result_ready.connect(self.display_odoo_test_result)
-        self.test_thread.start()
-        
-        return f"Ejecutando pruebas de Odoo para el módulo {module_name}..."
+        return self.commands.dispatch(command)
 
     def analyze_environment(self):
         self.progress_bar.setVisible(True)
-        self.analysis_thread = EnvironmentAnalysisThread()
+        self.analysis_thread = EnvironmentAnalysisThread(self.odoo_workload())
         self.analysis_thread.progress_update.connect(self.update_progress)
         self.analysis_thread.result_ready.connect(self.display_environment_analysis)
         self.analysis_thread.start()
+        return "Iniciando análisis del entorno..."
 
-    def add_odoo_path(self, command):
-        path = command.split("add odoo path", 1)[1].strip()
-        if not path:
-            path = QFileDialog.getExistingDirectory(self, "Seleccionar directorio de módulos Odoo")
-        if path:
-            path_id = self.db_manager.save_odoo_path(path)
-            return f"Nueva ruta de Odoo añadida: {path}"
-        else:
-            return "No se seleccionó ninguna ruta."
-
-    def list_odoo_paths(self):
-        paths = self.db_manager.get_odoo_paths()
-        if paths:
-            return "Rutas de Odoo registradas:\n" + "\n".join([f"{id}: {path}" for id, path in paths])
-        else:
-            return "No hay rutas de Odoo registradas."
-
-    def analyze_all_odoo_paths(self):
+    def analyze_all_odoo_paths(self, incremental=True):
         paths = self.db_manager.get_odoo_paths()
         if not paths:
             return "No hay rutas de Odoo registradas. Por favor, añade una ruta primero."
-        
-        for path_id, path in paths:
-            self.progress_bar.setVisible(True)
-            self.analysis_thread = self.mahoraga.learn_odoo_structure(path)
-            self.analysis_thread.progress_update.connect(self.update_progress_with_message)
-            self.analysis_thread.result_ready.connect(self.display_odoo_analysis_result)
-            self.analysis_thread.module_analyzed.connect(self.save_odoo_module_with_test)
-            self.analysis_thread.start()
-        
-        return f"Analizando módulos de Odoo en {len(paths)} rutas..."
 
-    def run_odoo_tests(self):
+        self.changed_modules = set()
         self.progress_bar.setVisible(True)
-        paths = self.db_manager.get_odoo_paths()
-        if not paths:
-            return "No hay rutas de Odoo registradas. Por favor, añade una ruta primero."
-        
-        odoo_path = paths[0][1]  # Assuming the first path is the Odoo server path
+        # Los procesos de análisis se reparten entre los trabajos que pueden correr a la vez
+        workers = max(1, self.analysis_workers // min(self.jobs.max_jobs, len(paths)))
+        for path_id, path in paths:
+            # El análisis completo también ignora la caché de pruebas
+            analysis_thread = self.mahoraga.learn_odoo_structure(path, incremental, workers, self.settings['analysis_include'],
+                                                                 self.settings['analysis_exclude'], use_test_cache=incremental)
+            analysis_thread.module_analyzed.connect(self.save_odoo_module_with_test)
+            self.jobs.submit('analisis', path, analysis_thread)
         
-        config_path, ok = QInputDialog.getText(self, "Configuración de Odoo", "Ingrese la ruta del archivo de configuración de Odoo:")
+        return f"Analizando módulos de Odoo en {len(paths)} rutas ({self.jobs.max_jobs} a la vez)..."
+
+    def run_odoo_tests(self, force=False):
+        config_path, ok = QInputDialog.getText(self, "Configuración de Odoo", "Ingrese la ruta del archivo de configuración de Odoo:",
+                                               text=self.settings['odoo_config'])
         if not ok or not config_path:
             return "No se proporcionó la ruta del archivo de configuración."
         
-        db_name, ok = QInputDialog.getText(self, "Base de datos", "Ingrese el nombre de la base de datos:")
+        db_name, ok = QInputDialog.getText(self, "Base de datos", "Ingrese el nombre de la base de datos plantilla:",
+                                           text=self.settings['test_database'])
         if not ok or not db_name:
             return "No se proporcionó el nombre de la base de datos."
         
-        module_name, ok = QInputDialog.getText(self, "Módulo", "Ingrese el nombre del módulo a probar:")
-        if not ok or not module_name:
+        module_name, ok = QInputDialog.getText(self, "Módulo", "Ingrese los módulos a probar, separados por comas (vacío = módulos afectados por el último análisis o, si no hay, todos los analizados):")
+        if not ok:
             return "No se proporcionó el nombre del módulo."
 
-        self.test_thread = OdooTestThread(odoo_path, config_path, db_name, module_name)
-        self.test_thread.progress_update.connect(self.update_progress_with_message)
-        self.test_thread.result_ready.connect(self.display_odoo_test_result)
-        self.test_thread.start()
+        self.settings.update(odoo_config=config_path, test_database=db_name)
+        save_settings(self.settings)
+        return self.start_odoo_tests([name.strip() for name in module_name.split(",") if name.strip()], force)
+
+    def start_odoo_tests(self, module_names, force=False):
+        try:
+            module_names = self.pending_test_modules(module_names, force)
+        except DependencyCycleError as e:
+            return str(e)
+        if not module_names:
+            return self.format_cached_test_results()
+
+        self.progress_bar.setVisible(True)
+        test_thread = OdooTestThread(self.settings, module_names, durations=self.db_manager.get_test_durations())
+        test_thread.shard_finished.connect(self.save_test_shard)
+        self.jobs.submit('tests', ",".join(module_names), test_thread)
         
-        return f"Ejecutando pruebas de Odoo para el módulo {module_name}..."
+        return (f"Ejecutando pruebas de Odoo para el módulo {','.join(module_names)} "
+                f"en {len(test_thread.shards)} shards...")
+
+    def choose_odoo_path(self):
+        return QFileDialog.getExistingDirectory(self, "Seleccionar directorio de módulos Odoo")
+
+    @command("estado modelo")
+    def model_status(self):
+        error = self.mahoraga.load_error()
+        if error:
+            return f"No se pudo cargar el modelo Mahoraga: {type(error).__name__}: {error}"
+        if not self.mahoraga.is_ready():
+            return "El modelo Mahoraga todavía se está cargando."
+        metadata = self.mahoraga.metadata
+        discarded = ""
+        if self.mahoraga.checkpoint_error:
+            discarded = f"\nSe descartó el checkpoint guardado ({self.mahoraga.checkpoint_error})."
+        if not metadata:
+            return "El modelo Mahoraga aún no ha sido entrenado." + discarded
+        return (f"Modelo Mahoraga versión {metadata['version']}: entrenado con {metadata['samples']} análisis "
+                f"el {metadata['trained_at']}" + discarded)
+
+    @command("iniciar monitor", prefix=True)
+    def start_monitor(self, value):
+        if self.monitor_thread and self.monitor_thread.isRunning():
+            return "El monitor del entorno ya está en marcha."
+        interval = float(value) if value.replace('.', '', 1).isdigit() and float(value) > 0 else 5.0
+        self.monitor_thread = EnvironmentMonitorThread(self.db_manager.db_name, interval, workers=self.odoo_workers)
+        self.monitor_thread.start()
+        return f"Monitor del entorno iniciado: una muestra cada {interval:g} segundos."
+
+    @command("detener monitor")
+    def stop_monitor(self):
+        if not self.monitor_thread or not self.monitor_thread.isRunning():
+            return "El monitor del entorno no está en marcha."
+        self.monitor_thread.stop()
+        return f"Monitor del entorno detenido tras {self.monitor_thread.samples_taken} muestras."
+
+    @command("estado monitor")
+    def monitor_status(self):
+        if not self.monitor_thread or not self.monitor_thread.last_sample:
+            return "El monitor del entorno no tiene muestras todavía."
+        timestamp, metrics, _ = self.monitor_thread.last_sample
+        iowait = metrics['cpu_iowait_percent']
+        iowait = "no disponible" if iowait is None else f"{iowait:.1f}%"
+        lines = [
+            f"Última muestra ({time.strftime('%H:%M:%S', time.localtime(timestamp))}):",
+            f"  CPU: {metrics['cpu_usage_percent']:.1f}% (iowait {iowait})",
+            f"  Memoria: {metrics['memory_percent']:.1f}%, swap {metrics['swap_percent']:.1f}%",
+            f"  Disco: {metrics['disk_percent']:.1f}%",
+        ]
+        if self.monitor_thread.last_error:
+            lines.append(f"  {len(self.monitor_thread.buffer)} muestras pendientes de guardar: {self.monitor_thread.last_error}")
+        for kind, name, samples, cpu, memory_mb, read_rate, write_rate in self.db_manager.get_resource_summary(time.time() - 3600):
+            if kind == 'process':
+                lines.append(f"  Proceso {name}: CPU media {cpu:.1f}%, memoria máx. {memory_mb:.0f} MB")
+            else:
+                lines.append(f"  {kind} {name}: lectura {read_rate / 1024:.1f} KB/s, escritura {write_rate / 1024:.1f} KB/s")
+        return "\n".join(lines)
 
+    @command("predecir optimización")
     def predict_optimization(self):
-        environment_data = self.db_manager.get_last_environment_analysis()
-        odoo_data = self.db_manager.get_odoo_modules()
-        if not environment_data or not odoo_data:
+        environment_metrics = self.db_manager.get_last_environment_metrics()
+        module_stats = self.db_manager.get_module_stats()
+        if not environment_metrics or not module_stats['module_count']:
             return "No hay suficientes datos para realizar una predicción. Por favor, analiza el entorno y los módulos de Odoo primero."
+        error = self.mahoraga.load_error()
+        if error:
+            return f"No se pudo cargar el modelo Mahoraga: {type(error).__name__}: {error}"
+        if not self.mahoraga.is_ready():
+            self.mahoraga.preload()
+            return "El modelo Mahoraga todavía se está cargando. Inténtalo de nuevo en unos segundos."
         
-        optimization_score = self.mahoraga.predict_optimization(environment_data, odoo_data)
+        optimization_score = self.mahoraga.predict_optimization(environment_metrics, module_stats)
         return f"Predicción de optimización: {optimization_score:.2f}%"
 
     def update_progress(self, value):
@@ -237,54 +243,105 @@ class Zegion(QWidget):
     def display_environment_analysis(self, result):
         self.progress_bar.setVisible(False)
         analysis = json.loads(result)
-        self.db_manager.save_environment_analysis(analysis)
+        metrics = analysis['metrics']
+        self.db_manager.save_environment_metrics(metrics)
+        breakdown = ', '.join(f"{component} {metrics['score_' + component]:.0f}%" for component in SCORE_COMPONENTS
+                              if metrics.get('score_' + component) is not None)
         formatted_result = (
             f"Análisis del Entorno:\n\n"
             f"Sistema Operativo: {analysis['os']['system']} {analysis['os']['release']}\n"
             f"Procesador: {analysis['os']['processor']}\n\n"
             f"CPU:\n"
-            f"  Núcleos físicos: {analysis['cpu']['physical_cores']}\n"
-            f"  Núcleos totales: {analysis['cpu']['total_cores']}\n"
-            f"  Frecuencia máxima: {analysis['cpu']['max_frequency']}\n"
-            f"  Uso por núcleo: {', '.join(analysis['cpu']['usage_per_core'])}\n\n"
+            f"  Núcleos físicos: {metrics['cpu_physical_cores']}\n"
+            f"  Núcleos totales: {metrics['cpu_cores']}\n"
+            f"  Frecuencia máxima: {metrics['cpu_max_frequency_mhz']:.2f}Mhz\n"
+            f"  Uso por núcleo: {', '.join(f'{percentage:.1f}%' for percentage in analysis['usage_per_core'])}\n\n"
             f"Memoria:\n"
-            f"  Total: {analysis['memory']['total']}\n"
-            f"  Disponible: {analysis['memory']['available']}\n"
-            f"  Usada: {analysis['memory']['used']} ({analysis['memory']['percentage']})\n\n"
+            f"  Total: {metrics['memory_total_gb']:.2f} GB\n"
+            f"  Disponible: {metrics['memory_available_gb']:.2f} GB\n"
+            f"  Usada: {metrics['memory_used_gb']:.2f} GB ({metrics['memory_percent']}%)\n\n"
             f"Disco:\n"
-            f"  Total: {analysis['disk']['total']}\n"
-            f"  Usado: {analysis['disk']['used']} ({analysis['disk']['percentage']})\n"
-            f"  Libre: {analysis['disk']['free']}\n\n"
+            f"  Total: {metrics['disk_total_gb']:.2f} GB\n"
+            f"  Usado: {metrics['disk_used_gb']:.2f} GB ({metrics['disk_percent']}%)\n"
+            f"  Libre: {metrics['disk_free_gb']:.2f} GB\n\n"
             f"Red:\n"
-            f"  Datos enviados: {analysis['network']['bytes_sent']}\n"
-            f"  Datos recibidos: {analysis['network']['bytes_recv']}\n\n"
-            f"Optimización del sistema: {analysis['optimization']}\n"
+            f"  Datos enviados: {metrics['net_bytes_sent'] / (1024**2):.2f} MB\n"
+            f"  Datos recibidos: {metrics['net_bytes_recv'] / (1024**2):.2f} MB\n\n"
+            f"Optimización del sistema: {metrics['optimization']:.1f}%\n"
+            f"  Desglose: {breakdown}\n"
+            f"  Cuello de botella: {analysis['bottleneck'] or 'ninguno'}\n"
         )
         self.response_text.setPlainText(formatted_result)
         self.speak("Análisis del entorno completado. Por favor, revisa los resultados en la interfaz.")
 
-        # Entrenar el modelo con los nuevos datos
-        odoo_data = self.db_manager.get_odoo_modules()
-        self.mahoraga.train_model(analysis, odoo_data)
+        # Reentrenar en segundo plano con todo el historial de análisis
+        self.mahoraga.train_model()
 
-    def display_odoo_analysis_result(self, result):
-        self.progress_bar.setVisible(False)
-        self.response_text.setPlainText(result)
-        self.speak("Análisis de módulos de Odoo completado.")
+    def display_job_result(self, kind, result):
+        # Los análisis se muestran juntos al terminar el último, en jobs_finished
+        if kind == 'tests':
+            self.display_odoo_test_result(result)
+
+    def jobs_finished(self, kind):
+        # Los tramos de cada tanda de trabajos se guardan al terminarla, no en cada llamada
+        flush_metrics(self.db_manager)
+        if kind == 'analisis':
+            # Solo cuando ya no queda ningún análisis escribiendo blobs nuevos
+            self.db_manager.prune_source_blobs()
+            self.dependency_graph = None
+            self.response_text.setPlainText("\n\n".join(self.jobs.results('analisis')))
+            self.speak("Análisis de módulos de Odoo completado.")
 
     def display_odoo_test_result(self, result):
-        self.progress_bar.setVisible(False)
-        self.response_text.setPlainText(result)
+        cached = self.format_cached_test_results() if self.cached_test_results else ""
+        self.response_text.setPlainText(f"{result}\n{cached}" if cached else result)
         self.speak("Ejecución de pruebas de Odoo completada.")
-        
-        # Save test result to database
-        module_name = result.split("para el módulo")[-1].strip().split()[0]
-        self.db_manager.update_test_result(module_name, result)
 
-    def save_odoo_module_with_test(self, module_name, module_path, code_content, test_content, version, path_id, test_result):
-        self.db_manager.save_odoo_module(module_name, module_path, code_content, test_content, version, path_id)
-        self.db_manager.update_test_result(module_name, test_result)
+    @command("cancelar tests")
+    def cancel_odoo_tests(self):
+        if not self.jobs.cancel(kind='tests'):
+            return "No hay pruebas de Odoo en ejecución."
+        return "Cancelando las pruebas de Odoo..."
+
+    @command("trabajos")
+    def list_jobs(self):
+        jobs = self.jobs.describe()
+        if not jobs:
+            return "No hay trabajos en curso."
+        return f"Trabajos (máximo {self.jobs.max_jobs} a la vez, progreso total {self.jobs.progress()}%):\n" + "\n".join(jobs)
+
+    @command("cancelar trabajo", "cancelar trabajos", prefix=True)
+    def cancel_jobs(self, value):
+        value = value.lstrip("#")
+        if value and not value.isdigit():
+            return "Número de trabajo no válido."
+        cancelled = self.jobs.cancel(int(value) if value else None)
+        return f"Trabajos cancelados: {cancelled}"
+
+    def save_odoo_module_with_test(self, module_name, version, path_id, file_count, bytes_read):
+        # El hilo de análisis ya guardó el módulo; aquí solo se anota como afectado para las pruebas
+        self.changed_modules.add(module_name)
 
     def speak(self, text):
-        self.engine.say(text)
-        self.engine.runAndWait()
\ No newline at end of file
+        self.speech.say(text)
+
+    @command("activar voz")
+    def enable_voice(self):
+        return self.set_voice(True)
+
+    @command("desactivar voz")
+    def disable_voice(self):
+        return self.set_voice(False)
+
+    @command("tiempo de inicio")
+    def startup_report(self):
+        return self.startup_timer.report() if self.startup_timer else "No hay datos de arranque."
+
+    def set_voice(self, enabled):
+        self.speech.set_muted(not enabled)
+        return "Voz activada." if enabled else "Voz desactivada."
+
+    @command("silencio")
+    def stop_speaking(self):
+        self.speech.interrupt()
+        return ""